@@ -0,0 +1,204 @@
+import os
+import sys
+import copy
+import json
+import timeit
+import argparse
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+from itertools import product
+
+from voter import *
+from dataset import Dataset
+from dataset.distribution import *
+
+ALGORITHMS = [Majority(), TruthFinder(base_trust=0.001), TwoEstimates(base_trust=0.001), ThreeEstimates(base_trust=0.001)]
+ITERATIVE = (TruthFinder, TwoEstimates, ThreeEstimates)
+
+# Packages imported by the scripts and every worker process, and the modules they only load on first use
+IMPORTS = ['voter', 'dataset']
+DEFERRED = ['scipy.stats', 'scipy.sparse', 'tqdm']
+
+
+def get_grid(n_sources, n_dataitems, n_distinct, coverage):
+    return [dict(zip(['n_sources', 'n_dataitems', 'n_distinct', 'coverage'], case))
+            for case in product(n_sources, n_dataitems, n_distinct, coverage)]
+
+def measure(func, arg, repeats, warmup):
+    """Times ``func(arg)`` ``repeats`` times after ``warmup`` untimed calls, then measures its peak memory in a separate call."""
+    for _ in range(warmup):
+        func(arg)
+
+    times = []
+    for _ in range(repeats):
+        start_time = timeit.default_timer()
+        out = func(arg)
+        times.append(timeit.default_timer() - start_time)
+
+    # Traced on its own, tracemalloc slows the allocations down
+    tracemalloc.start()
+    func(arg)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return out, {'min': min(times), 'median': float(np.median(times)), 'mean': float(np.mean(times)), 'peak_memory': peak}
+
+def run_benchmark(grid, algorithms, repeats=5, warmup=1, seed=0):
+    records = []
+    for i, case in enumerate(grid):
+        seq = np.random.SeedSequence(seed, spawn_key=(i,))
+        timings = {}
+
+        # Rebuilt from the same seed on every call, all repeats time the same dataset
+        ds, timings['Dataset'] = measure(lambda seq: Dataset(case['n_sources'], case['n_dataitems'], case['n_distinct'],
+                                                             Constant(case['coverage']), Uniform(0, 1), Uniform(0, 1),
+                                                             Uniform(0, 1), seed=seq), seq, repeats, warmup)
+        claims, timings['get_claims'] = measure(lambda ds: ds.get_claims(), ds, repeats, warmup)
+
+        for algo in algorithms:
+            name = _name(algo)
+            _, timings[name] = measure(algo.run, claims, repeats, warmup)
+
+            if isinstance(algo, ITERATIVE):
+                log = IterationLog()
+                algo.run(claims, callback=log)
+                summary = log.summary()
+                timings[name].update(evaluations=summary['evaluations'], converged=summary['converged'])
+
+                # Step evaluations the accelerated variant saves over the plain one
+                plain = timings.get(algo.__class__.__name__)
+                if algo.accelerate and plain is not None and 'evaluations' in plain:
+                    timings[name]['evaluations_saved'] = plain['evaluations'] - summary['evaluations']
+
+        records.append(dict(case, n_claims=len(claims), timings=timings))
+        print(_format(records[-1]), file=sys.stderr)
+
+    return {'repeats': repeats, 'warmup': warmup, 'seed': seed, 'cases': records, 'scaling': scaling(records)}
+
+def import_time(module, repeats):
+    """Times a cold ``import module`` in ``repeats`` fresh interpreters, with the deferred modules it still loaded."""
+    code = (f"import sys, json, timeit; start_time = timeit.default_timer(); import {module}; "
+            f"print(json.dumps([timeit.default_timer() - start_time, [m for m in {DEFERRED!r} if m in sys.modules]]))")
+
+    times = []
+    for _ in range(repeats):
+        out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+        elapsed, loaded = json.loads(out.stdout)
+        times.append(elapsed)
+
+    return {'min': min(times), 'median': float(np.median(times)), 'mean': float(np.mean(times)), 'loaded': loaded}
+
+def scaling(records):
+    """Exponent of runtime in the claim count for each phase, the slope of log(median) over log(n_claims).
+
+    An exponent close to 1 is linear, close to 2 a quadratic path.
+    """
+    n_claims = np.log([record['n_claims'] for record in records])
+    exponents = {}
+    for name in records[0]['timings']:
+        times = np.log([record['timings'][name]['median'] for record in records])
+        exponents[name] = float(np.polyfit(n_claims, times, 1)[0]) if np.ptp(n_claims) > 0 else None
+    return exponents
+
+def compare(records, baseline, threshold):
+    """Returns the (case, phase, ratio) whose median time grew by more than ``threshold`` over the baseline.
+
+    Import times are compared as well when both hold them, as the case ``{'import': module}``.
+    """
+    keys = ['n_sources', 'n_dataitems', 'n_distinct', 'coverage']
+    stored = {tuple(case[key] for key in keys): case['timings'] for case in baseline['cases']}
+
+    regressions = []
+    for module, timing in records.get('imports', {}).items():
+        if module in baseline.get('imports', {}):
+            ratio = timing['median'] / baseline['imports'][module]['median']
+            if ratio > threshold:
+                regressions.append(({'import': module}, module, ratio))
+
+    for case in records['cases']:
+        old = stored.get(tuple(case[key] for key in keys))
+        if old is None:
+            continue
+        for name, timing in case['timings'].items():
+            if name in old:
+                ratio = timing['median'] / old[name]['median']
+                if ratio > threshold:
+                    regressions.append(({key: case[key] for key in keys}, name, ratio))
+    return regressions
+
+def _name(algo):
+    return algo.__class__.__name__ + ("+squarem" if getattr(algo, 'accelerate', False) else "")
+
+def _format(record):
+    timings = ", ".join(f"{name} {timing['median'] * 1000:.1f}ms/{timing['peak_memory'] / 2**20:.1f}MB"
+                        for name, timing in record['timings'].items())
+    return f"{record['n_sources']}x{record['n_dataitems']}x{record['n_distinct']} c={record['coverage']} " \
+           f"({record['n_claims']} claims): {timings}"
+
+def main():
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument('--n_sources', '-s', type=int, nargs='+', default=[100, 200, 400])
+    parser.add_argument('--n_dataitems', '-o', type=int, nargs='+', default=[500])
+    parser.add_argument('--n_distinct', '-d', type=int, nargs='+', default=[20])
+    parser.add_argument('--coverage', '-c', type=float, nargs='+', default=[0.25, 0.75])
+    parser.add_argument('--repeats', '-r', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=str, default=None)
+    parser.add_argument('--baseline', type=str, default=None)
+    parser.add_argument('--threshold', type=float, default=1.25)
+    parser.add_argument('--accelerate', action='store_true')
+    parser.add_argument('--imports', action='store_true')
+
+    args = vars(parser.parse_args())
+
+    grid = get_grid(args['n_sources'], args['n_dataitems'], args['n_distinct'], args['coverage'])
+    algorithms = ALGORITHMS
+    if args['accelerate']:
+        # Every iterative voter directly followed by its accelerated variant
+        algorithms = []
+        for algo in ALGORITHMS:
+            algorithms.append(algo)
+            if isinstance(algo, ITERATIVE):
+                algorithms.append(copy.copy(algo))
+                algorithms[-1].accelerate = True
+    records = run_benchmark(grid, algorithms, args['repeats'], args['warmup'], args['seed'])
+
+    # Cold start of the packages, none of the deferred modules may be loaded by importing them
+    deferred = []
+    if args['imports']:
+        records['imports'] = {module: import_time(module, args['repeats']) for module in IMPORTS}
+        for module, timing in records['imports'].items():
+            print(f"import {module}: {timing['median'] * 1000:.1f}ms", file=sys.stderr)
+            deferred += [(module, loaded) for loaded in timing['loaded']]
+        for module, loaded in deferred:
+            print(f"Eager import: {module} loads {loaded}", file=sys.stderr)
+
+    print("Scaling exponents in n_claims: " + ", ".join(f"{name} {exponent:.2f}" for name, exponent in records['scaling'].items()
+                                                        if exponent is not None), file=sys.stderr)
+
+    if args['output'] is not None:
+        with open(args['output'], "w") as f:
+            json.dump(records, f, indent = 4)
+    else:
+        json.dump(records, sys.stdout, indent = 4)
+
+    if args['baseline'] is not None:
+        with open(args['baseline']) as f:
+            regressions = compare(records, json.load(f), args['threshold'])
+        for case, name, ratio in regressions:
+            print(f"Regression: {name} on {case} is {ratio:.2f}x slower than the baseline", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+    if deferred:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,4 @@
 from .dataset import Dataset
+from .store import ClaimStore
+from .shared import SharedDataset
 from . import distribution
\ No newline at end of file
@@ -3,15 +3,15 @@ import timeit
 import numpy as np
 import pandas as pd
 
-from tqdm import tqdm
-
 MASK_NA = 0
 MASK_T = 1
 MASK_F = 2
 
+COLUMNS = ['Source', 'DataItem', 'Value']
+
 class Dataset():
     
-    def __init__(self, n_sources, n_dataitems, n_distinct, coverage_dist, truth_dist, distinct_dist, spread_dist, verbose=0) -> None:
+    def __init__(self, n_sources, n_dataitems, n_distinct, coverage_dist, truth_dist, distinct_dist, spread_dist, verbose=0, seed=None, chunk_size=None) -> None:
         
         # Values are taken in a batch from the Spread distribution and within that batch normalised to sum to 1.
         # For example: Uniform(x, x) is the same for any x, but if the low and high value differ, the relativ change will be passed forward.
@@ -19,34 +19,39 @@ class Dataset():
         
         self.verbose = verbose
         self.len_claims = None
+        self.rng = np.random.default_rng(seed)
         
         self.n_sources = n_sources
         self.n_dataitems = n_dataitems
         self.n_distinct = n_distinct
 
-        self.coverage_dist = coverage_dist.rvs()
-        self.truth_dist = truth_dist.rvs()
-        self.distinct_dist = distinct_dist.rvs()
-        self.spread_dist = spread_dist.rvs()
+        self._coverage, self._truth = coverage_dist, truth_dist
+        self.coverage_dist = coverage_dist.sampler(self.rng)
+        self.truth_dist = truth_dist.sampler(self.rng)
+        self.distinct_dist = distinct_dist.sampler(self.rng)
+        self.spread_dist = spread_dist.sampler(self.rng)
 
         if verbose == 1:
             start_time = timeit.default_timer()
 
-        # Generate Source Masks
-        self.rows = []
-        self.add_truth()
-        self.add_claims()
-        self.data = pd.concat(self.rows)
-        
         # Generate DataItem Masks
         self.make_distinct()
         
-        # Randomise Values
+        # Randomise Values, the ground truth is kept as a separate vector
         self.randomise()
         
-        # Separate Ground Truth and Data
-        self.truth = self.data.loc[['Truth']]
-        self.data = self.data.drop('Truth')
+        # Generate Source Masks, in one block unless streaming in chunks of sources. Every chunk
+        # draws from its own child seed, so each pass over the chunks rebuilds the same claims.
+        # The children are derived rather than spawned, spawning would advance the caller's
+        # SeedSequence and the same seed (e.g. of a ClaimStore or benchmark cell) would stream other claims
+        self.chunk_size = chunk_size
+        if chunk_size is None:
+            self.data = pd.DataFrame(self._generate(self.n_sources))
+        else:
+            self.data = None
+            seq = self.rng.bit_generator.seed_seq
+            self.chunk_seeds = [np.random.SeedSequence(seq.entropy, spawn_key=seq.spawn_key + (i,))
+                                for i in range(-(-self.n_sources // chunk_size))]
 
         if verbose == 1:
             print(f"Dataset Generated: {timeit.default_timer() - start_time:.4f} s")
@@ -55,66 +60,91 @@ class Dataset():
         #self.data['T'] = self.data[self.data == MASK_T].count(axis=1)
         #self.data['NA'] = self.data[self.data == MASK_NA].count(axis=1)
 
-    def get_claims(self):
-        res = []
-        for col in self._verbose_iter(self.data.columns, "Claims"):
-            for idx, val in enumerate(self.data[col]):
-                if val == 0: continue
-                res.append([idx, col, val])
-        claims = pd.DataFrame(res, columns=['Source', 'DataItem', 'Value'])
-        self.len_claims = len(claims)
-        return claims
+    def get_claims(self, as_arrays=False):
+        # Claims ordered by data item, then source
+        if self.data is not None:
+            claims = _to_claims(self.data.to_numpy())
+        else:
+            chunks = list(self.iter_claims(as_arrays=True))
+            claims = {col: np.concatenate([c[col] for c in chunks]) for col in COLUMNS}
+            order = np.lexsort((claims['Source'], claims['DataItem']))
+            claims = {col: val[order] for col, val in claims.items()}
+
+        self.len_claims = len(claims['Source'])
+        if as_arrays:
+            return claims
+        return pd.DataFrame(claims)
+
+    def iter_claims(self, as_arrays=False):
+        """Yields the claims of chunk_size sources at a time, only the nonzero claims are kept.
+
+        Without chunk_size the generated data is yielded as a single chunk. Chunks are generated
+        from their own seeds, every pass yields the same claims (but not those of the same seed without chunk_size).
+        """
+        if self.data is not None:
+            chunks = [(0, self.data.to_numpy())]
+        else:
+            chunks = ((start, self._generate(min(self.chunk_size, self.n_sources - start), np.random.default_rng(seq)))
+                      for start, seq in zip(range(0, self.n_sources, self.chunk_size), self.chunk_seeds))
 
+        len_claims = 0
+        for start, matrix in self._verbose_iter(chunks, "Claims"):
+            claims = _to_claims(matrix, start)
+            len_claims += len(claims['Source'])
+            yield claims if as_arrays else pd.DataFrame(claims)
+        self.len_claims = len_claims
 
     def randomise(self):
-        for idx in self._verbose_iter(range(self.n_dataitems), "Randomise"):
-            temp_map = dict(enumerate(np.random.randint(10_000_000, 100_000_000, self.n_distinct + 1)))
-            temp_map[0] = 0
-            self.data[idx].replace(temp_map, inplace=True)
-        
+        # One lookup table row per data item, mapping the masks 1..n_distinct to random values
+        self.table = self.rng.integers(10_000_000, 100_000_000, (self.n_dataitems, self.n_distinct + 1), dtype=np.int32)
+        self.table[:, MASK_NA] = 0
+        self.truth = self.table[:, MASK_T]
 
     def make_distinct(self):
-        distinct_list = self.distinct_dist(self.n_dataitems) * self.n_distinct
-        for idx, distinct in enumerate(self._verbose_iter(distinct_list, "DataItems")):
-            
-            if int(distinct) <= 1: continue
-            vals = []
-            probas = self.spread_dist(int(distinct) - 1)
-            dist = np.random.multinomial((self.data[idx] == MASK_F).sum(), probas / probas.sum())
-            
-            for i, v in enumerate(dist):
-                vals.extend([i] * v)
-            vals = np.array(vals)
-            np.random.shuffle(vals)
-            
-            self.data[idx][self.data[idx] == MASK_F] += vals
-            
-
-    def _add(self, index, values):
-        self.rows.append(pd.DataFrame({index: values}, dtype=int).transpose())
-
-    def add_truth(self):
-        self._add('Truth', np.zeros(self.n_dataitems) + MASK_T)
-
-    def add_claims(self):
-        for source_id in self._verbose_iter(range(self.n_sources), "Sources"):
-            
-            n_zeroes = int(self.n_dataitems * (1 - self.coverage_dist(1)))    # Objects without value       (represented by 0)
-            n_values = self.n_dataitems - n_zeroes                            # Split into truths and falsehoods
-            n_false = int(n_values * (1 - self.truth_dist(1)))                # Objects with the true value (represented by 1)
-            n_truth = n_values - n_false                                      # Objects with false values   (represented by 2)
-                        
-            zeroes = np.zeros(n_zeroes) + MASK_NA
-            truths = np.zeros(n_truth) + MASK_T
-            falses = np.zeros(n_false) + MASK_F
-            
-            claim = np.concatenate((zeroes, truths, falses))
-            np.random.shuffle(claim)
-            self._add(source_id, claim)
+        distinct_list = (self.distinct_dist(self.n_dataitems) * self.n_distinct).astype(int)
+        self.n_spread = n_spread = np.where(distinct_list > 1, distinct_list - 1, 0)
+
+        # Spread probabilities for all data items in one draw, as cumulative sums per item
+        probas = self.spread_dist(n_spread.sum())
+        self.spread_offsets = np.concatenate(([0], np.cumsum(n_spread)))
+        item_of_proba = np.repeat(np.arange(self.n_dataitems), n_spread)
+        totals = np.bincount(item_of_proba, probas, self.n_dataitems)
+        cdf = np.cumsum(probas) - np.repeat(np.concatenate(([0], np.cumsum(totals)[:-1])), n_spread)
+        self.spread_cdf = cdf / totals[item_of_proba] + item_of_proba
+
+    def add_claims(self, n_sources, rng=None):
+        if rng is None:
+            rng, coverage_dist, truth_dist = self.rng, self.coverage_dist, self.truth_dist
+        else:
+            coverage_dist, truth_dist = self._coverage.sampler(rng), self._truth.sampler(rng)
+
+        n_zeroes = (self.n_dataitems * (1 - coverage_dist(n_sources))).astype(int)       # Objects without value       (represented by 0)
+        n_values = self.n_dataitems - n_zeroes                                           # Split into truths and falsehoods
+        n_false = (n_values * (1 - truth_dist(n_sources))).astype(int)                   # Objects with the true value (represented by 1)
+        n_truth = n_values - n_false                                                     # Objects with false values   (represented by 2)
+
+        cols = np.arange(self.n_dataitems)
+        claims = np.zeros((n_sources, self.n_dataitems), dtype=np.int32)
+        claims[cols < n_truth[:, None]] = MASK_T
+        claims[(cols >= n_truth[:, None]) & (cols < n_values[:, None])] = MASK_F
+        return rng.permuted(claims, axis=1, out=claims)
+
+    def _generate(self, n_sources, rng=None):
+        rng = self.rng if rng is None else rng
+        matrix = self.add_claims(n_sources, rng)
+
+        # Every false claim draws its value independently, which is the shuffled multinomial
+        rows, cols = np.nonzero(matrix == MASK_F)
+        spread = self.n_spread[cols] > 0
+        rows, cols = rows[spread], cols[spread]
+        picks = np.searchsorted(self.spread_cdf, rng.random(len(cols)) + cols, side='right') - self.spread_offsets[cols]
+        matrix[rows, cols] += np.clip(picks, 0, self.n_spread[cols] - 1).astype(np.int32)
+
+        return self.table[np.arange(self.n_dataitems), matrix]
 
     def compare(self, results):
         np_results = results.to_numpy()
-        np_truth = np.tile(self.truth.to_numpy(), (np_results.shape[0], 1))
+        np_truth = np.tile(self.truth, (np_results.shape[0], 1))
 
         assert np_truth.shape == np_results.shape, (np_truth.shape, np_results.shape)
         sums = np.equal(np_truth, np_results).sum()
@@ -123,6 +153,16 @@ class Dataset():
     
     def _verbose_iter(self, iter_list, title):
         if self.verbose > 1:
+            from tqdm import tqdm
             return tqdm(iter_list, desc=f'{title:<12}')
         else:
             return iter_list
+
+
+def _to_claims(values, first_source=0):
+    # Long-format claims of a (sources x items) value matrix, ordered by data item, then source
+    values = values.T
+    items, sources = np.nonzero(values)
+    return {'Source': (sources + first_source).astype(np.int32),
+            'DataItem': items.astype(np.int32),
+            'Value': values[items, sources].astype(np.int64)}
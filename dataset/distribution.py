@@ -1,5 +1,31 @@
 import numpy as np
-import scipy as sc
+
+from functools import cached_property
+
+
+class _InverseCDF():
+    # Vectorised sampling through the inverse CDF ``_ppf`` of the unflipped distribution. With
+    # ``lut`` points the inverse CDF is tabulated once and interpolated linearly when sampling.
+    # The scipy distribution ``dist`` is only built (and scipy.stats imported) on first use
+    flipped = False
+    lut = None
+
+    def sample(self, size, rng):
+        """Draws ``size`` values in one call from the np.random.Generator ``rng``."""
+        u = rng.random(size)
+        if self.lut is None:
+            x = self._ppf(u)
+        else:
+            if not hasattr(self, '_table'):
+                self._table = self._ppf(np.linspace(0, 1, self.lut))
+            x = np.interp(u, np.linspace(0, 1, self.lut), self._table)
+        return 1 - x if self.flipped else x
+
+    def sampler(self, rng):
+        return lambda x: self.sample(x, rng)
+
+    def _lut_info(self):
+        return {} if self.lut is None else {'lut': self.lut}
 
 
 class Constant():
@@ -10,42 +36,54 @@ class Constant():
     def _get_info(self):
         return {'name': 'Constant', 'value': self.value}
     
-    def rvs(self):
+    def rvs(self, random_state=None):
         def _const(x):
             return np.zeros(x) + self.value
         return _const
 
+    def sample(self, size, rng):
+        return np.zeros(size) + self.value
+
+    def sampler(self, rng):
+        return self.rvs()
+
     def pdf(self):
         raise NotImplementedError
 
-class Uniform():
+class Uniform(_InverseCDF):
     def __init__(self, low, high):
         assert low >= 0 and high <= 1
         self.low, self.high = low, high
-        self.dist = sc.stats.uniform(loc=low, scale=high-low)
 
     def _get_info(self):
         return {'name': 'Uniform', 'low': self.low, 'high': self.high}
 
-    def rvs(self):
-        return lambda x: self.dist.rvs(size=x)
+    def rvs(self, random_state=None):
+        return lambda x: self.dist.rvs(size=x, random_state=random_state)
     
     def pdf(self):
         return self.dist.pdf
 
-class TruncExponential():
-    def __init__(self, lmbda, flipped=False):
-        self.lmbda, self.flipped = lmbda, flipped
-        self.dist = sc.stats.truncexpon(b=lmbda, loc=0, scale=1/lmbda)
+    def _ppf(self, u):
+        return self.low + u * (self.high - self.low)
+
+    @cached_property
+    def dist(self):
+        from scipy import stats
+        return stats.uniform(loc=self.low, scale=self.high-self.low)
+
+class TruncExponential(_InverseCDF):
+    def __init__(self, lmbda, flipped=False, lut=None):
+        self.lmbda, self.flipped, self.lut = lmbda, flipped, lut
 
     def _get_info(self):
-        return {'name': 'TruncExponential', 'lmbda': self.lmbda, 'flipped': self.flipped}
+        return {'name': 'TruncExponential', 'lmbda': self.lmbda, 'flipped': self.flipped, **self._lut_info()}
 
-    def rvs(self):
+    def rvs(self, random_state=None):
         if self.flipped:
-            return lambda x: 1 - self.dist.rvs(size=x)
+            return lambda x: 1 - self.dist.rvs(size=x, random_state=random_state)
         else:
-            return lambda x: self.dist.rvs(size=x)
+            return lambda x: self.dist.rvs(size=x, random_state=random_state)
     
     def pdf(self):
         if self.flipped:
@@ -53,36 +91,52 @@ class TruncExponential():
         else:
             return self.dist.pdf
 
-class TruncNormal():
-    def __init__(self, mean, stdv):
-        self.mean, self.stdv = mean, stdv
-        a, b = (0 - mean) / stdv, (1 - mean) / stdv
-        self.dist = sc.stats.truncnorm(a=a, b=b, loc=mean, scale=stdv)
+    def _ppf(self, u):
+        # Exponential truncated to [0, 1]
+        return -np.log1p(u * np.expm1(-self.lmbda)) / self.lmbda
+
+    @cached_property
+    def dist(self):
+        from scipy import stats
+        return stats.truncexpon(b=self.lmbda, loc=0, scale=1/self.lmbda)
+
+class TruncNormal(_InverseCDF):
+    def __init__(self, mean, stdv, lut=None):
+        self.mean, self.stdv, self.lut = mean, stdv, lut
 
     def _get_info(self):
-        return {'name': 'TruncNormal', 'mean': self.mean, 'stdv': self.stdv}
+        return {'name': 'TruncNormal', 'mean': self.mean, 'stdv': self.stdv, **self._lut_info()}
 
-    def rvs(self):
-        return lambda x: self.dist.rvs(size=x)
+    def rvs(self, random_state=None):
+        return lambda x: self.dist.rvs(size=x, random_state=random_state)
     
     def pdf(self):
         return self.dist.pdf
 
-class TruncPareto():
-    def __init__(self, alpha=None, flipped=False):
+    def _ppf(self, u):
+        # No closed form, a single vectorised scipy call
+        return self.dist.ppf(u)
+
+    @cached_property
+    def dist(self):
+        from scipy import stats
+        a, b = (0 - self.mean) / self.stdv, (1 - self.mean) / self.stdv
+        return stats.truncnorm(a=a, b=b, loc=self.mean, scale=self.stdv)
+
+class TruncPareto(_InverseCDF):
+    def __init__(self, alpha=None, flipped=False, lut=None):
         if alpha is None:
             alpha = np.log10(5)/np.log10(4)
-        self.alpha, self.flipped = alpha, flipped
-        self.dist = sc.stats.truncpareto(b=alpha, c=2.0, loc=-1)
+        self.alpha, self.flipped, self.lut = alpha, flipped, lut
 
     def _get_info(self):
-        return {'name': 'TruncPareto', 'alpha': self.alpha, 'flipped': self.flipped}
+        return {'name': 'TruncPareto', 'alpha': self.alpha, 'flipped': self.flipped, **self._lut_info()}
 
-    def rvs(self):
+    def rvs(self, random_state=None):
         if self.flipped:
-            return lambda x: 1 - self.dist.rvs(size=x)
+            return lambda x: 1 - self.dist.rvs(size=x, random_state=random_state)
         else:
-            return lambda x: self.dist.rvs(size=x)
+            return lambda x: self.dist.rvs(size=x, random_state=random_state)
     
     def pdf(self):
         if self.flipped:
@@ -90,6 +144,15 @@ class TruncPareto():
         else:
             return self.dist.pdf
 
+    def _ppf(self, u):
+        # Pareto on [1, 2] shifted to [0, 1]
+        return (1 - u * (1 - 2.0 ** -self.alpha)) ** (-1 / self.alpha) - 1
+
+    @cached_property
+    def dist(self):
+        from scipy import stats
+        return stats.truncpareto(b=self.alpha, c=2.0, loc=-1)
+
 
 
 #def Custom(cdf_inversion):
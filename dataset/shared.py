@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from multiprocessing import shared_memory
+
+from .dataset import Dataset, COLUMNS
+
+class SharedDataset():
+    """A generated dataset held in one ``multiprocessing.shared_memory`` block.
+
+    The process that ``create``s it hands the picklable ``spec`` to its workers, which ``attach``
+    to the same claim columns and truth vector without copying. Only the creator ``unlink``s it.
+    """
+
+    def __init__(self, spec, shm) -> None:
+        self.spec = spec
+        self.shm = shm
+
+        self.n_dataitems = spec['n_dataitems']
+        arrays = {name: np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+                  for name, (offset, dtype, shape) in spec['arrays'].items()}
+        self.truth = arrays.pop('truth')
+        self.claims = arrays
+        self.len_claims = len(self.claims['Source'])
+
+    @classmethod
+    def create(cls, ds):
+        claims = ds.get_claims(as_arrays=True)
+        arrays = dict({col: np.asarray(claims[col]) for col in COLUMNS}, truth=np.asarray(ds.truth))
+
+        # Arrays laid out back to back, each aligned to 8 bytes
+        layout, size = {}, 0
+        for name, val in arrays.items():
+            layout[name] = (size, val.dtype.str, val.shape)
+            size += -(-val.nbytes // 8) * 8
+
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        shared = cls({'name': shm.name, 'n_dataitems': ds.n_dataitems, 'arrays': layout}, shm)
+        for name, val in arrays.items():
+            target = shared.truth if name == 'truth' else shared.claims[name]
+            target[...] = val
+        return shared
+
+    @classmethod
+    def attach(cls, spec):
+        # Workers share the resource tracker of the process that started them, which registers
+        # the block only once and forgets it when the creator unlinks it
+        return cls(spec, shared_memory.SharedMemory(name=spec['name']))
+
+    def get_claims(self, as_arrays=False):
+        if as_arrays:
+            return self.claims
+        return pd.DataFrame(self.claims)
+
+    def compare(self, results):
+        return Dataset.compare(self, results)
+
+    def close(self):
+        # The views have to go before the block can be closed
+        del self.claims, self.truth
+        self.shm.close()
+
+    def unlink(self):
+        self.close()
+        self.shm.unlink()
+
@@ -0,0 +1,98 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from .dataset import Dataset, COLUMNS
+
+MANIFEST = "manifest.json"
+
+class StoredDataset():
+    """A generated dataset read back from a ClaimStore.
+
+    The claim columns and the truth vector are memory-mapped ``.npy`` files, so voters read
+    them without copying.
+    """
+
+    def __init__(self, path) -> None:
+        self.path = path
+        with open(os.path.join(path, MANIFEST), "r") as f:
+            self.manifest = json.load(f)
+
+        self.n_sources = self.manifest['n_sources']
+        self.n_dataitems = self.manifest['n_dataitems']
+        self.n_distinct = self.manifest['n_distinct']
+        self.truth = np.load(os.path.join(path, "truth.npy"), mmap_mode='r')
+        self.claims = {col: np.load(os.path.join(path, col + ".npy"), mmap_mode='r') for col in COLUMNS}
+        self.len_claims = len(self.claims['Source'])
+
+    def get_claims(self, as_arrays=False):
+        if as_arrays:
+            return self.claims
+        return pd.DataFrame(self.claims)
+
+    def compare(self, results):
+        return Dataset.compare(self, results)
+
+
+class ClaimStore():
+    """On-disk cache of generated datasets, one directory of column files per configuration.
+
+    A configuration is keyed by the dataset parameters, the ``_get_info()`` of its four
+    distributions and the seed, which are also written to the manifest.
+    """
+
+    def __init__(self, root) -> None:
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def get(self, n_sources, n_dataitems, n_distinct, coverage_dist, truth_dist, distinct_dist, spread_dist, seed):
+        """Returns the stored dataset, generating and storing it first if needed."""
+        manifest = _manifest(n_sources, n_dataitems, n_distinct, coverage_dist, truth_dist, distinct_dist, spread_dist, seed)
+        path = os.path.join(self.root, _key(manifest))
+
+        if not os.path.isfile(os.path.join(path, MANIFEST)):
+            ds = Dataset(n_sources, n_dataitems, n_distinct, coverage_dist, truth_dist, distinct_dist, spread_dist, seed=seed)
+            self._write(path, ds.get_claims(as_arrays=True), ds.truth, manifest)
+
+        return StoredDataset(path)
+
+    def _write(self, path, claims, truth, manifest):
+        # Written to a temporary directory first, so readers never see a partial dataset
+        tmp = f"{path}.tmp{os.getpid()}"
+        os.makedirs(tmp, exist_ok=True)
+        for col in COLUMNS:
+            np.save(os.path.join(tmp, col + ".npy"), claims[col])
+        np.save(os.path.join(tmp, "truth.npy"), truth)
+        with open(os.path.join(tmp, MANIFEST), "w") as f:
+            json.dump(dict(manifest, n_claims=len(claims['Source'])), f, indent=4)
+
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Stored concurrently by another process
+            shutil.rmtree(tmp)
+
+
+def _manifest(n_sources, n_dataitems, n_distinct, coverage_dist, truth_dist, distinct_dist, spread_dist, seed):
+    return {
+        'n_sources': n_sources,
+        'n_dataitems': n_dataitems,
+        'n_distinct': n_distinct,
+        'coverage_dist': coverage_dist._get_info(),
+        'truth_dist': truth_dist._get_info(),
+        'distinct_dist': distinct_dist._get_info(),
+        'spread_dist': spread_dist._get_info(),
+        'seed': _seed_info(seed)
+    }
+
+def _seed_info(seed):
+    if isinstance(seed, np.random.SeedSequence):
+        return {'entropy': seed.entropy, 'spawn_key': list(seed.spawn_key)}
+    return seed
+
+def _key(manifest):
+    return hashlib.sha1(json.dumps(manifest, sort_keys=True).encode()).hexdigest()[:16]
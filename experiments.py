@@ -1,11 +1,16 @@
 import os
 import json
+import time
 import timeit
 import argparse
 
+import numpy as np
+
 from tqdm import tqdm
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from voter import Optimal
-from dataset import Dataset
+from dataset import Dataset, ClaimStore, SharedDataset
+from sinks import SINKS, open_sink
 from itertools import product
 
 from voter import *
@@ -21,71 +26,180 @@ from dataset.distribution import *
 def get_distributions(coverage, truth, distinct, spread):
     return list(product(coverage, truth, distinct, spread))
 
-def run_experiments(filename, params, distribs, algorithms, save_interval, start_index, stop_index):
-    iteration = 0
-    
-    filename = os.path.join("results", filename + ".json")
-
-    if os.path.isfile(filename):
-        raise FileExistsError
-            
-    records = {
-            'n_sources': params['n_sources'],
-            'n_dataitems': params['n_dataitems'],
-            'n_distinct': params['n_distinct'],
-            'algorithms_info': [algo._get_info() for algo in algorithms],
-            'experiments': []
-        }
+def run_experiments(filename, params, distribs, algorithms, save_interval, start_index, stop_index, store=None, seed=None,
+                    workers=1, folder="results", sink='jsonl', shared=False):
+    # An existing output is resumed, grid cells whose iteration_index it already holds are skipped
+    with open_sink(os.path.join(folder, filename), sink, save_interval) as records:
+        if seed is None and records.header is not None:
+            seed = records.header.get('seed')
+        # Without a seed the datasets of a store could never be reused, it defaults to 0 as before
+        if seed is None and store is not None:
+            seed = 0
+
+        # Every distribution combination draws from its own child of this sequence
+        entropy = np.random.SeedSequence(seed).entropy
+
+        header = {
+                'n_sources': params['n_sources'],
+                'n_dataitems': params['n_dataitems'],
+                'n_distinct': params['n_distinct'],
+                'algorithms_info': [algo._get_info() for algo in algorithms],
+                'seed': entropy
+            }
+
+        # Compared as stored, JSON turns tuples into lists
+        if records.header is not None and records.header != json.loads(json.dumps(header)):
+            raise ValueError(f"{records.path} holds experiments of a different configuration")
+        records.begin(header)
 
+        if workers > 1 and shared:
+            _run_shared(records, params, distribs, algorithms, start_index, stop_index, store, entropy, workers)
+        elif workers > 1:
+            _run_parallel(records, params, distribs, algorithms, start_index, stop_index, store, entropy, workers)
+        else:
+            _run_serial(records, params, distribs, algorithms, start_index, stop_index, store, entropy)
+
+def _run_serial(sink, params, distribs, algorithms, start_index, stop_index, store, entropy):
     #options = list(product(get_parameters(**params), get_distributions(**distribs)))
-    for distributions in (pbar := tqdm(get_distributions(**distribs))):
+    for iteration, distributions in enumerate(pbar := tqdm(get_distributions(**distribs))):
+
+        if stop_index is not None and iteration >= stop_index: break
 
-        if iteration < start_index: 
+        if iteration < start_index or iteration in sink.completed: 
             pbar.set_postfix_str("Skipping")
-            iteration += 1
             continue
 
         pbar.set_postfix_str("Dataset")
 
-        ds = Dataset(*params.values(), *distributions, verbose=0)
+        ds = _get_dataset(params, distributions, store, _cell_seed(entropy, iteration))
         claims = ds.get_claims()
  
-        infos = {
-            'coverage_dist': distributions[0]._get_info(),
-            'truth_dist': distributions[1]._get_info(),
-            'distinct_dist': distributions[2]._get_info(),
-            'spread_dist': distributions[3]._get_info(),
-            'optimal': ds.compare(Optimal().run(claims, ds.truth)),
-            'n_claims': len(claims), 
-            'iteration_index': iteration,
-            'results': {}
-        }
+        infos = _get_infos(distributions, ds, claims, iteration)
 
         for algo in algorithms:
             pbar.set_postfix_str(algo.__class__.__name__)
-            results = {}
-                        
-            start_time = timeit.default_timer()
-            values = algo.run(claims)
-            results['time'] = timeit.default_timer() - start_time
-            
-            results['scores'] = ds.compare(values)
-            infos['results'][algo.__class__.__name__] = results
+            infos['results'][algo.__class__.__name__] = _run_algorithm(algo, ds, claims)
         
         pbar.set_postfix_str("Saving")
 
-        records['experiments'].append(infos)
-        if iteration % save_interval == 0:
-            with open(filename, "w") as f:
-                json.dump(records, f, indent = 4)
+        sink.append(infos)
 
-        iteration += 1
-        
-        if stop_index is not None and iteration >= stop_index: break
-        #if iteration == 3: return
+def _run_parallel(sink, params, distribs, algorithms, start_index, stop_index, store, entropy, workers):
+    combos = get_distributions(**distribs)
+    indices = [iteration for iteration in range(start_index, len(combos) if stop_index is None else min(stop_index, len(combos)))
+               if iteration not in sink.completed]
+    root = None if store is None else store.root
+
+    # One task per (combination, algorithm), the first algorithm of each combination also scores Optimal
+    tasks = [(iteration, params, combos[iteration], algo, a == 0, root, _cell_seed(entropy, iteration))
+             for iteration in indices for a, algo in enumerate(algorithms)]
+
+    pending = {}
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_run_task, task) for task in tasks]
+        for future in tqdm(as_completed(futures), total=len(futures)):
+            iteration, name, infos, results = future.result()
+
+            experiment = pending.setdefault(iteration, {'infos': None, 'results': {}})
+            if infos is not None:
+                experiment['infos'] = infos
+            experiment['results'][name] = results
+
+            if len(experiment['results']) < len(algorithms):
+                continue
+
+            # Combination complete, results are kept in the order of the algorithms list
+            del pending[iteration]
+            infos = experiment['infos']
+            for algo in algorithms:
+                infos['results'][algo.__class__.__name__] = experiment['results'][algo.__class__.__name__]
+
+            sink.append(infos)
+
+def _run_task(task):
+    iteration, params, distributions, algo, optimal, root, seed = task
+
+    # Regenerated from the combination's seed, so every algorithm of a combination sees the same claims
+    ds = _get_dataset(params, distributions, None if root is None else ClaimStore(root), seed)
+    claims = ds.get_claims()
+
+    infos = _get_infos(distributions, ds, claims, iteration) if optimal else None
 
-    with open(filename, "w") as f:
-        json.dump(records, f, indent = 4)
+    return iteration, algo.__class__.__name__, infos, _run_algorithm(algo, ds, claims)
+
+def _run_shared(sink, params, distribs, algorithms, start_index, stop_index, store, entropy, workers):
+    # Each dataset is generated once and put in shared memory, its algorithms run side by side in workers attached to it
+    with ProcessPoolExecutor(min(workers, len(algorithms))) as pool:
+        for iteration, distributions in enumerate(pbar := tqdm(get_distributions(**distribs))):
+
+            if stop_index is not None and iteration >= stop_index: break
+
+            if iteration < start_index or iteration in sink.completed:
+                pbar.set_postfix_str("Skipping")
+                continue
+
+            pbar.set_postfix_str("Dataset")
+
+            ds = _get_dataset(params, distributions, store, _cell_seed(entropy, iteration))
+            claims = ds.get_claims()
+
+            infos = _get_infos(distributions, ds, claims, iteration)
+
+            pbar.set_postfix_str("Algorithms")
+
+            shared = SharedDataset.create(ds)
+            try:
+                futures = [pool.submit(_run_shared_task, shared.spec, algo) for algo in algorithms]
+                for algo, future in zip(algorithms, futures):
+                    infos['results'][algo.__class__.__name__] = future.result()
+            finally:
+                shared.unlink()
+
+            pbar.set_postfix_str("Saving")
+
+            sink.append(infos)
+
+def _run_shared_task(spec, algo):
+    ds = SharedDataset.attach(spec)
+    try:
+        # The CPU time of this worker, the algorithms running next to it do not count towards it
+        return _run_algorithm(algo, ds, ds.get_claims(as_arrays=True), timer=time.process_time)
+    finally:
+        ds.close()
+
+def _cell_seed(entropy, iteration):
+    return np.random.SeedSequence(entropy, spawn_key=(iteration,))
+
+def _get_dataset(params, distributions, store, seed):
+    if store is None:
+        return Dataset(*params.values(), *distributions, verbose=0, seed=seed)
+    return store.get(*params.values(), *distributions, seed=seed)
+
+def _get_infos(distributions, ds, claims, iteration):
+    return {
+        'coverage_dist': distributions[0]._get_info(),
+        'truth_dist': distributions[1]._get_info(),
+        'distinct_dist': distributions[2]._get_info(),
+        'spread_dist': distributions[3]._get_info(),
+        'optimal': ds.compare(Optimal().run(claims, ds.truth)),
+        'n_claims': len(claims), 
+        'iteration_index': iteration,
+        'results': {}
+    }
+
+def _run_algorithm(algo, ds, claims, timer=timeit.default_timer):
+    results = {}
+    # The iterative voters also report their iterations, convergence and time per phase
+    log = IterationLog() if isinstance(algo, (TruthFinder, TwoEstimates, ThreeEstimates)) else None
+                
+    start_time = timer()
+    values = algo.run(claims) if log is None else algo.run(claims, callback=log)
+    results['time'] = timer() - start_time
+    
+    results['scores'] = ds.compare(values)
+    if log is not None:
+        results.update(log.summary())
+    return results
 
 def main():
     
@@ -99,6 +213,11 @@ def main():
     parser.add_argument('--save_interval', '-i', type=int, default=20)
     parser.add_argument('--start_index', type=int, default=0)
     parser.add_argument('--stop_index', type=int, default=None)
+    parser.add_argument('--cache', type=str, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', '-w', type=int, default=1)
+    parser.add_argument('--sink', type=str, default='jsonl', choices=list(SINKS))
+    parser.add_argument('--shared', action='store_true')
 
     args = vars(parser.parse_args())
 
@@ -132,15 +251,13 @@ def main():
                     'distinct': distribs_list, 'spread': [distribs_list[args['index']]]}
         filename = args['filename'] + f"-part{args['index']}"
 
-    if args['start_index'] != 0:
-        filename += "_" + str(args['start_index'])
-    if args['stop_index'] is not None:
-        filename += "-" + str(args['stop_index'] - 1)
-
     algorithms = [Majority(), TruthFinder(base_trust=0.001), 
                   TwoEstimates(base_trust=0.001), ThreeEstimates(base_trust=0.001)]
 
-    run_experiments(filename, params, distribs, algorithms, args['save_interval'], args['start_index'], args['stop_index'])
+    store = None if args['cache'] is None else ClaimStore(args['cache'])
+
+    run_experiments(filename, params, distribs, algorithms, args['save_interval'], args['start_index'], args['stop_index'],
+                    store, args['seed'], args['workers'], sink=args['sink'], shared=args['shared'])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
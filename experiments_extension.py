@@ -1,87 +1,13 @@
 import os
-import json
-import timeit
 import argparse
 
-from tqdm import tqdm
-from voter import Optimal
-from dataset import Dataset
-from itertools import product
+from sinks import SINKS
+from experiments import run_experiments
 
 from voter import *
 from dataset.distribution import *
 
 
-def get_distributions(coverage, truth, distinct, spread):
-    return list(product(coverage, truth, distinct, spread))
-
-
-def run_experiments(filename, params, distribs, algorithms, save_interval, start_index, stop_index, skip_list=[]):
-    iteration = 0
-    
-    filename = os.path.join("results", "raw", filename + ".json")
-
-    if os.path.isfile(filename):
-        raise FileExistsError
-            
-    records = {
-            'n_sources': params['n_sources'],
-            'n_dataitems': params['n_dataitems'],
-            'n_distinct': params['n_distinct'],
-            'algorithms_info': [algo._get_info() for algo in algorithms],
-            'experiments': []
-        }
-
-    for distributions in (pbar := tqdm(get_distributions(**distribs))):
-
-        if iteration < start_index: 
-            pbar.set_postfix_str("Skipping")
-            iteration += 1
-            continue
-
-        pbar.set_postfix_str("Dataset")
-
-        ds = Dataset(*params.values(), *distributions, verbose=0)
-        claims = ds.get_claims()
- 
-        infos = {
-            'coverage_dist': distributions[0]._get_info(),
-            'truth_dist': distributions[1]._get_info(),
-            'distinct_dist': distributions[2]._get_info(),
-            'spread_dist': distributions[3]._get_info(),
-            'optimal': ds.compare(Optimal().run(claims, ds.truth)),
-            'n_claims': len(claims), 
-            'iteration_index': iteration,
-            'results': {}
-        }
-
-        for algo in algorithms:
-            pbar.set_postfix_str(algo.__class__.__name__)
-            results = {}
-                        
-            start_time = timeit.default_timer()
-            values = algo.run(claims)
-            results['time'] = timeit.default_timer() - start_time
-            
-            results['scores'] = ds.compare(values)
-            infos['results'][algo.__class__.__name__] = results
-        
-        pbar.set_postfix_str("Saving")
-
-        records['experiments'].append(infos)
-        if iteration % save_interval == 0:
-            with open(filename, "w") as f:
-                json.dump(records, f, indent = 4)
-
-        iteration += 1
-        
-        if stop_index is not None and iteration >= stop_index: break
-        #if iteration == 3: return
-
-    with open(filename, "w") as f:
-        json.dump(records, f, indent = 4)
-
-
 def main():
     
     parser = argparse.ArgumentParser()
@@ -94,6 +20,9 @@ def main():
     parser.add_argument('--save_interval', '-i', type=int, default=20)
     parser.add_argument('--start_index', type=int, default=0)
     parser.add_argument('--stop_index', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--workers', '-w', type=int, default=1)
+    parser.add_argument('--sink', type=str, default='jsonl', choices=list(SINKS))
     parser.add_argument('--extension', type=str, default=None, 
                         choices=['coverage', 'truth', 'distinct', 'spread'])
 
@@ -135,14 +64,10 @@ def main():
         distribs[args['extension']] = distribs_extension
         filename += f"-ext{args['extension']}"
 
-    if args['start_index'] != 0:
-        filename += "_" + str(args['start_index'])
-    if args['stop_index'] is not None:
-        filename += "-" + str(args['stop_index'] - 1)
-
     algorithms = [TwoEstimates(base_trust=0.001)]
 
-    run_experiments(filename, params, distribs, algorithms, args['save_interval'], args['start_index'], args['stop_index'])
+    run_experiments(filename, params, distribs, algorithms, args['save_interval'], args['start_index'], args['stop_index'],
+                    seed=args['seed'], workers=args['workers'], folder=os.path.join("results", "raw"), sink=args['sink'])
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
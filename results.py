@@ -0,0 +1,180 @@
+import os
+import json
+import sqlite3
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from itertools import combinations
+
+DISTRIBUTIONS = ['coverage_dist', 'truth_dist', 'distinct_dist', 'spread_dist']
+MERGE_ON = ['n_sources', 'n_dataitems', 'n_distinct'] + DISTRIBUTIONS
+EXTRAS = ['optimal_perc_score', 'optimal_score', 'n_claims']
+OPTIONS = ['time', 'score_perc', 'score']
+
+EXTENSIONS = ['.json', '.jsonl', '.sqlite']
+
+
+def read_records(path):
+    """Returns the header and the list of experiments of a results file written by any of the sinks."""
+    if path.endswith(".jsonl"):
+        with open(path) as f:
+            lines = [json.loads(line) for line in f if line.endswith("\n")]
+        return lines[0], sorted(lines[1:], key=lambda infos: infos['iteration_index'])
+
+    if path.endswith(".sqlite"):
+        con = sqlite3.connect(path)
+        header = {key: json.loads(value) for key, value in con.execute("SELECT key, value FROM meta")}
+        experiments = [json.loads(row[0]) for row in con.execute("SELECT record FROM experiments ORDER BY iteration_index")]
+        con.close()
+        return header, experiments
+
+    with open(path) as f:
+        records = json.load(f)
+    return records, records['experiments']
+
+def flatten(header, experiments):
+    """Flattens the experiments of one file into a frame, one row per experiment, in a single pass."""
+    labels = {}
+    columns = {dist: [] for dist in DISTRIBUTIONS}
+    columns.update({extra: [] for extra in EXTRAS})
+    columns['iteration_index'] = []
+
+    for experiment in experiments:
+        for dist in DISTRIBUTIONS:
+            info = experiment[dist]
+            key = tuple(info.items())
+            if key not in labels:
+                labels[key] = _label(info)
+            columns[dist].append(labels[key])
+
+        columns['optimal_perc_score'].append(experiment['optimal'][0])
+        columns['optimal_score'].append(experiment['optimal'][1])
+        columns['n_claims'].append(experiment['n_claims'])
+        columns['iteration_index'].append(experiment.get('iteration_index', -1))
+
+        for key, value in experiment['results'].items():
+            columns.setdefault(f'{key}_time', []).append(value['time'])
+            columns.setdefault(f'{key}_score_perc', []).append(value['scores'][0])
+            columns.setdefault(f'{key}_score', []).append(value['scores'][1])
+            if 'iterations' in value:
+                columns.setdefault(f'{key}_iterations', []).append(value['iterations'])
+                columns.setdefault(f'{key}_converged', []).append(value['converged'])
+
+    df = pd.DataFrame(columns)
+    for i, param in enumerate(['n_sources', 'n_dataitems', 'n_distinct']):
+        df.insert(i, param, header[param])
+    return df
+
+def load_results(paths, cache=None):
+    """Concatenates the flattened results files ``paths``.
+
+    With a ``cache`` directory the table is stored there as Parquet, keyed by the paths and
+    their modification times, and read back as long as none of the files changed.
+    """
+    if cache is not None:
+        stamp = [(os.path.abspath(path), os.stat(path).st_mtime_ns) for path in paths]
+        key = hashlib.sha1(json.dumps(stamp).encode()).hexdigest()[:16]
+        cached = os.path.join(cache, key + ".parquet")
+        if os.path.isfile(cached):
+            return pd.read_parquet(cached)
+
+    df = pd.concat([flatten(*read_records(path)) for path in paths], ignore_index=True)
+
+    if cache is not None:
+        os.makedirs(cache, exist_ok=True)
+        df.to_parquet(cached, index=False)
+    return df
+
+def results_to_dataframe(exp_name, in_parts, postfix_list=None, folder=None, return_optional=False, cache=None):
+    """Loads an experiment from ``results/raw``, optionally split in five ``-partN`` files (see ``experiments.py --index``)."""
+    n_parts = 5 if in_parts else 1
+    if postfix_list is not None and len(postfix_list) != n_parts:
+        raise ValueError("Length of postfix list must match number of parts")
+
+    paths = []
+    for i in range(n_parts):
+        for postfix in ([''] if postfix_list is None else ['', postfix_list[i]]):
+            name = f"{exp_name}-part{i}" if in_parts else exp_name
+            paths.append(_find(os.path.join("results", "raw", *([] if folder is None else [folder]), name + postfix)))
+
+    df = load_results(paths, cache)
+
+    if return_optional:
+        header, _ = read_records(paths[-1])
+        return df, {algo['name']: algo for algo in header['algorithms_info']}
+    return df
+
+def combine_runs(runs, algorithms):
+    """Joins the repeated runs ``{run: frame}`` of one grid on the experiment parameters.
+
+    Every metric gets one ``_{run}`` column per run, followed by its mean over the runs.
+    """
+    metrics = EXTRAS + [f"{algo}_{op}" for algo in algorithms for op in OPTIONS]
+
+    stacked = pd.concat({run: df.set_index(MERGE_ON)[metrics] for run, df in runs.items()}, names=['run'])
+    if stacked.index.duplicated().any():
+        raise ValueError("Experiment parameters do not identify the rows of a run")
+
+    wide = stacked.unstack('run')
+    order = next(iter(runs.values())).set_index(MERGE_ON).index
+    wide = wide.reindex(order)
+
+    df = pd.DataFrame(index=wide.index)
+    for run in runs:
+        for metric in metrics:
+            df[f"{metric}_{run}"] = wide[(metric, run)]
+
+    means = wide.T.groupby(level=0).mean().T
+    for metric in metrics[len(EXTRAS):] + EXTRAS:
+        df[metric] = means[metric]
+    return df.reset_index()
+
+def add_aggregates(df, algorithms, runs):
+    """Adds the ``final_combined.csv`` aggregates to a frame of ``combine_runs``.
+
+    These are the claim count rounded to 10k, the pairwise differences of the mean percentage
+    scores (``Maj-Tru``, ...), the best and worst run of every algorithm with their spread and,
+    per algorithm, whether its mean score is the best of the row (``win_``, ties count for all).
+    """
+    df = df.copy()
+    df["n_claims_10k"] = df["n_claims"].round(-4)
+
+    for a, b in combinations(algorithms, 2):
+        df[f"{a[:3]}-{b[:3]}"] = df[f"{a}_score_perc"] - df[f"{b}_score_perc"]
+
+    for algo in algorithms:
+        scores = df[[f"{algo}_score_perc_{run}" for run in runs]].to_numpy()
+        df[f"{algo}_score_perc_max"] = scores.max(axis=1)
+        df[f"{algo}_score_perc_min"] = scores.min(axis=1)
+    for algo in algorithms:
+        df[f"{algo}_score_perc_diff"] = df[f"{algo}_score_perc_max"] - df[f"{algo}_score_perc_min"]
+
+    scores = df[[f"{algo}_score" for algo in algorithms]].to_numpy()
+    best = scores == scores.max(axis=1, keepdims=True)
+    for i, algo in enumerate(algorithms):
+        df[f"win_{algo}"] = best[:, i]
+
+    df["_agg_total"] = 1
+    return df
+
+def wins(df, algorithms):
+    """Number of rows each algorithm wins (see ``add_aggregates``)."""
+    return pd.Series(np.count_nonzero(df[[f"win_{algo}" for algo in algorithms]].to_numpy(), axis=0), index=algorithms)
+
+def _find(path):
+    for extension in EXTENSIONS:
+        if os.path.isfile(path + extension):
+            return path + extension
+    raise FileNotFoundError(path)
+
+def _label(info):
+    prefix = ""
+    if info.get('flipped', False):
+        prefix += "F_"
+    if info['name'] == 'TruncExponential' and info['lmbda'] == 15:
+        prefix += "S_"
+    if info['name'] == 'TruncPareto' and info['alpha'] == 25.3:
+        prefix += "S_"
+    return prefix + info['name']
@@ -0,0 +1,126 @@
+import os
+import json
+import sqlite3
+
+
+class JsonSink():
+    """The original records file, the whole structure is rewritten every ``save_interval`` experiments.
+
+    An existing file is loaded, ``header`` and ``completed`` (the stored iteration indices) describe what it holds.
+    """
+
+    extension = ".json"
+
+    def __init__(self, path, save_interval=1) -> None:
+        self.path = path + self.extension
+        self.save_interval = save_interval
+
+        self.records = None
+        if os.path.isfile(self.path):
+            with open(self.path) as f:
+                self.records = json.load(f)
+
+        self.header = None if self.records is None else {key: value for key, value in self.records.items() if key != 'experiments'}
+        self.completed = set() if self.records is None else {infos['iteration_index'] for infos in self.records['experiments']}
+
+    def begin(self, header):
+        if self.records is None:
+            self.records = dict(header, experiments=[])
+
+    def append(self, infos):
+        self.records['experiments'].append(infos)
+        if infos['iteration_index'] % self.save_interval == 0:
+            self._dump()
+
+    def close(self):
+        if self.records is not None:
+            self.records['experiments'].sort(key=lambda infos: infos['iteration_index'])
+            self._dump()
+
+    def _dump(self):
+        # Replaced in one step, an interrupted dump leaves the previous file intact
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(self.records, f, indent = 4)
+        os.replace(self.path + ".tmp", self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonLinesSink(JsonSink):
+    """One JSON object per line, the header first and then one line per finished experiment.
+
+    Every experiment is a single ``O_APPEND`` write, so runs appending to the same file do not clobber each other.
+    A partially written trailing line (an interrupted run) is cut off when the file is opened.
+    """
+
+    extension = ".jsonl"
+
+    def __init__(self, path, save_interval=1) -> None:
+        self.path = path + self.extension
+        self.fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+
+        with open(self.path, "rb") as f:
+            content = f.read()
+        complete = content.rfind(b"\n") + 1
+        if complete < len(content):
+            os.truncate(self.path, complete)
+
+        lines = [json.loads(line) for line in content[:complete].splitlines()]
+        self.header = lines[0] if lines else None
+        self.completed = {infos['iteration_index'] for infos in lines[1:]}
+
+    def begin(self, header):
+        if self.header is None:
+            self._write(header)
+
+    def append(self, infos):
+        self._write(infos)
+
+    def close(self):
+        os.close(self.fd)
+
+    def _write(self, obj):
+        os.write(self.fd, (json.dumps(obj) + "\n").encode())
+
+
+class SQLiteSink(JsonSink):
+    """SQLite database with the header in ``meta`` and one JSON row per experiment in ``experiments``.
+
+    Each experiment is committed on its own, concurrent writers are serialised by SQLite's locking.
+    """
+
+    extension = ".sqlite"
+
+    def __init__(self, path, save_interval=1) -> None:
+        self.path = path + self.extension
+        self.con = sqlite3.connect(self.path, timeout=60)
+        with self.con:
+            self.con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self.con.execute("CREATE TABLE IF NOT EXISTS experiments (iteration_index INTEGER PRIMARY KEY, record TEXT)")
+
+        self.header = {key: json.loads(value) for key, value in self.con.execute("SELECT key, value FROM meta")} or None
+        self.completed = {row[0] for row in self.con.execute("SELECT iteration_index FROM experiments")}
+
+    def begin(self, header):
+        with self.con:
+            self.con.executemany("INSERT OR IGNORE INTO meta VALUES (?, ?)",
+                                 [(key, json.dumps(value)) for key, value in header.items()])
+
+    def append(self, infos):
+        with self.con:
+            self.con.execute("INSERT OR REPLACE INTO experiments VALUES (?, ?)",
+                             (infos['iteration_index'], json.dumps(infos)))
+
+    def close(self):
+        self.con.close()
+
+
+SINKS = {'json': JsonSink, 'jsonl': JsonLinesSink, 'sqlite': SQLiteSink}
+
+def open_sink(path, kind='jsonl', save_interval=1):
+    """Opens the result sink ``kind`` at ``path``, the file extension is added by the sink."""
+    return SINKS[kind](path, save_interval)
@@ -0,0 +1,22 @@
+import pytest
+import numpy as np
+import pandas as pd
+
+from voter import TruthFinder, TwoEstimates
+
+def _claims():
+    return pd.DataFrame({'Source': [0, 1, 2, 0, 1], 'DataItem': [0, 0, 0, 1, 1], 'Value': [5, 5, 6, 7, 8]})
+
+def test_batch_matches_single_runs():
+    configs = [TruthFinder(0.3), TruthFinder(0.6, dampening_factor=0.3)]
+    for voter, res in zip(configs, TruthFinder.run_batch(_claims(), configs)):
+        assert res.equals(voter.run(_claims()))
+
+@pytest.mark.parametrize("configs", [
+    [TruthFinder(0.3), TruthFinder(0.3, backend='numpy')],
+    [TruthFinder(0.3), TruthFinder(0.3, dtype=np.float32)],
+    [TwoEstimates(0.3), TwoEstimates(0.3, accelerate=True)],
+])
+def test_batch_rejects_mixed_settings(configs):
+    with pytest.raises(ValueError):
+        configs[0].run_batch(_claims(), configs)
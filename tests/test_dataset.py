@@ -0,0 +1,17 @@
+import numpy as np
+
+from dataset import Dataset
+from dataset.distribution import Uniform
+
+def _dataset(seed, chunk_size=None):
+    return Dataset(50, 100, 5, Uniform(0, 1), Uniform(0, 1), Uniform(0, 1), Uniform(0, 1), seed=seed, chunk_size=chunk_size)
+
+def test_chunked_claims_are_reproducible():
+    ds = _dataset(1, chunk_size=10)
+    assert ds.get_claims().equals(ds.get_claims())
+    assert ds.len_claims == len(ds.get_claims())
+
+def test_same_seed_sequence_gives_same_chunks():
+    seq = np.random.SeedSequence(7, spawn_key=(3,))
+    assert _dataset(seq, chunk_size=10).get_claims().equals(_dataset(seq, chunk_size=10).get_claims())
+    assert seq.n_children_spawned == 0
@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+
+from voter import Session, TruthFinder, TwoEstimates
+
+def _claims():
+    return pd.DataFrame({'Source': [0, 1, 2, 0, 1], 'DataItem': [0, 0, 0, 1, 1], 'Value': [5, 5, 6, 7, 8]})
+
+def test_retract_unknown_claims():
+    claims = _claims()
+    session = Session(TruthFinder(0.3))
+    session.add(claims)
+    before = session.result()
+
+    session.retract(pd.DataFrame({'Source': [9], 'DataItem': [0], 'Value': [5]}))
+    session.retract(claims.iloc[:0])
+
+    assert len(session.claims) == len(claims)
+    assert session.result().equals(before)
+
+def test_result_before_add():
+    for voter in [TruthFinder(0.3), TwoEstimates(0.3)]:
+        res = Session(voter).result(top=2)
+        assert res.shape == (2, 0)
+        assert list(res.index) == [f"{voter.__class__.__name__}_1", f"{voter.__class__.__name__}_2"]
+
+def test_retract_then_result():
+    claims = _claims()
+    session = Session(TruthFinder(0.3))
+    session.add(claims)
+    session.retract(claims.iloc[[2]])
+
+    assert len(session.claims) == len(claims) - 1
+    assert np.array_equal(session.result().to_numpy(), [[5, 7]])
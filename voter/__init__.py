@@ -2,4 +2,9 @@ from .optimal import Optimal
 from .majority import Majority
 from .truth_finder import TruthFinder
 from .estimates import TwoEstimates
-from .estimates import ThreeEstimates
\ No newline at end of file
+from .estimates import ThreeEstimates
+from ._claims import CompiledClaims, compile_claims
+from .session import Session
+from .state import VoterState
+from .metrics import IterationLog
+from .components import label_components, run_components
\ No newline at end of file
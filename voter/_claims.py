@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from ._common import _encode_facts
+
+class CompiledClaims():
+    """Integer-coded view of a claims frame (or dict of column arrays), built once and shared by the iterative voters.
+
+    Sources, data items and facts (distinct (DataItem, Value) pairs) are numbered in
+    order of first appearance, i.e. the order of ``claims[col].unique()``.
+    """
+
+    def __init__(self, claims) -> None:
+        self.frame = claims
+
+        claim_source, sources = pd.factorize(claims['Source'])
+        claim_item, items = pd.factorize(claims['DataItem'])
+        claim_fact, fact_item, fact_value = _encode_facts(claim_item, claims['Value'])
+        self._compile(claim_source, claim_item, claim_fact, sources, items, fact_item, fact_value)
+
+    @classmethod
+    def _from_codes(cls, claim_source, claim_item, claim_fact, sources, items, fact_item, fact_value):
+        # Compiled from claims that are already coded, e.g. the live claims of a Session
+        cc = cls.__new__(cls)
+        cc.frame = None
+        cc._compile(claim_source, claim_item, claim_fact, sources, items, fact_item, fact_value)
+        return cc
+
+    def _compile(self, claim_source, claim_item, claim_fact, sources, items, fact_item, fact_value):
+        # Imported on the first compile, not with the package
+        from scipy import sparse
+
+        self.sources, self.items = sources, items
+        self.fact_item, self.fact_value = fact_item, fact_value
+
+        self.claim_source = claim_source
+        self.claim_item = claim_item
+        self.claim_fact = claim_fact
+
+        self.n_claims = len(claim_source)
+        self.n_sources = len(self.sources)
+        self.n_items = len(self.items)
+        self.n_facts = len(self.fact_item)
+
+        # Incidence matrices, entries count claims (duplicates are summed)
+        ones = np.ones(self.n_claims)
+        self.fact_source = sparse.csr_matrix((ones, (claim_fact, claim_source)), shape=(self.n_facts, self.n_sources))
+        self.source_fact = self.fact_source.T.tocsr()
+        self.item_source = sparse.csr_matrix((ones, (claim_item, claim_source)), shape=(self.n_items, self.n_sources))
+
+        # Binary (distinct) incidences
+        self.source_fact_bin = (self.source_fact > 0).astype(np.float64)
+        self.source_item_bin = (self.item_source.T > 0).astype(np.float64).tocsr()
+
+        # Distinct (source, fact) pairs, grouped by source
+        self.pair_source = np.repeat(np.arange(self.n_sources), np.diff(self.source_fact_bin.indptr))
+        self.pair_fact = self.source_fact_bin.indices
+
+        self.fact_claims = np.asarray(self.fact_source.sum(axis=1)).ravel()
+        self.item_claims = np.asarray(self.item_source.sum(axis=1)).ravel()
+        self.source_facts = np.diff(self.source_fact_bin.indptr)
+        self.source_items = np.diff(self.source_item_bin.indptr)
+
+        # Facts claimed by exactly one source, mapped to that source
+        fact_sources = np.diff(self.fact_source.indptr)
+        exclusive = fact_sources == 1
+        self.source_exclusive = sparse.csr_matrix(
+            (np.ones(exclusive.sum()), (self.fact_source.indices[self.fact_source.indptr[:-1][exclusive]],
+                                        np.flatnonzero(exclusive))),
+            shape=(self.n_sources, self.n_facts))
+
+    def fact_index(self):
+        return pd.MultiIndex.from_arrays([self.items[self.fact_item], self.fact_value], names=['DataItem', 'Value'])
+
+
+def compile_claims(claims):
+    if isinstance(claims, CompiledClaims):
+        return claims
+    return CompiledClaims(claims)
@@ -1,53 +1,203 @@
 import numpy as np
 import pandas as pd
 
-def _map_dict(values, dictionary):
-    if values.shape[0] == 0: return np.array([0])
-    return np.vectorize(dictionary.__getitem__)(values)
+from .state import VoterState
+from .metrics import _PhaseClock
+
+def _encode_facts(item_codes, values):
+    # Fact ids for (DataItem, Value) pairs in order of first appearance, so equal values
+    # on different data items are separate facts
+    value_codes, uniques = pd.factorize(values)
+    fact_codes, keys = pd.factorize(item_codes.astype(np.int64) * len(uniques) + value_codes)
+    return fact_codes, (keys // len(uniques)).astype(np.intp), np.asarray(uniques)[keys % len(uniques)]
+
+def _map_dict(ids, array):
+    # Gathers the per-source or per-fact values of array at ids
+    return array[ids]
 
 def _error(tw, tw_old):
     return 1 - np.dot(tw, tw_old / (np.linalg.norm(tw) * np.linalg.norm(tw_old)))
 
-def _get_highest_confidence(claims, confidence):
-    res = []
-    for d in claims['DataItem'].unique():
-        values = claims[claims['DataItem'] == d]['Value'].unique()
-        res.append(values[_map_dict(values, confidence).argmax()])
+def _dict_norm(array, lmbda):
+    # Normalises a vector, or each column of a (n, n_configs) matrix
+    min_val, max_val = array.min(axis=0), array.max(axis=0)
+    x1 = _normalise(array, min_val, max_val)
+    res = lmbda * x1 + (1 - lmbda) * np.round(array)
+    res[array == float('inf')] = float('inf')
+    return res
+
+def _bincount(codes, weights, n):
+    # np.bincount over the rows of a (len(codes), n_configs) weight matrix
+    if weights.ndim == 1:
+        return np.bincount(codes, weights, n)
+    k = weights.shape[1]
+    bins = (codes[:, None] * k + np.arange(k)).ravel()
+    return np.bincount(bins, weights.ravel(), n * k).reshape(n, k)
+
+def _as_voters(cls, configs):
+    return [c if isinstance(c, cls) else cls(**c) for c in configs]
+
+def _run_single(voter, claims, max_iter, top, initial_state, return_state, callback):
+    res = voter.run_batch(claims, [voter], max_iter, top, initial_state, return_state, callback)
+    if return_state:
+        return res[0][0], res[1][0]
+    return res[0]
+
+def _run_batch(cls, claims, configs, max_iter, top, initial_state, return_state, callback, name, bounds=None):
+    """Runs several configurations (voters or constructor kwargs) of cls together on the same claims.
+
+    The state is kept as (n, n_configs) matrices and every configuration is masked out once it
+    has converged. An initial_state (VoterState) warm-starts every configuration, return_state
+    additionally returns one VoterState per configuration. A callback (e.g. an IterationLog) is
+    called with the metrics of every iteration. The configurations share one backend, dtype and
+    accelerate (SQUAREM extrapolation, kept within bounds) setting, a ValueError is raised otherwise.
+    """
+    # _claims imports this module for _encode_facts
+    from ._claims import compile_claims
+
+    voters = _as_voters(cls, configs)
+    for attr in ('backend', 'dtype', 'accelerate'):
+        if len({getattr(v, attr, None) for v in voters}) > 1:
+            raise ValueError(f"{name} configurations of a batch must share their {attr}")
+    cc = compile_claims(claims)
+
+    state = cls._initial_state(cc, voters)
+    if initial_state is not None:
+        initial_state._warm_start(cc, state)
+
+    tolerance = np.array([v.tolerance for v in voters])
+    step = cls._make_step(cc, voters)
+    if voters[0].accelerate:
+        step = _squarem(step, tolerance, bounds)
+
+    state = _iterate(step, state, tolerance, max_iter, name, callback)
+    return _batch_results(cc, state, len(voters), top, name, return_state)
+
+def _batch_results(cc, state, n_configs, top, prefix, return_state):
+    res = [_get_top_k(cc, state['confidence'][:, j], top, prefix) for j in range(n_configs)]
+    if return_state:
+        return res, [VoterState.from_compiled(cc, state, j) for j in range(n_configs)]
     return res
 
-def _dict_norm(dictionary, lmbda):
-    vals = dictionary.values()
-    min_val, max_val = min(vals), max(vals)
-        
-    for key in dictionary:
-        val = dictionary[key]
-        if val == float('inf'):
-            dictionary[key] = float('inf')
-            continue
-        x1 = _normalise(val, min_val, max_val)
-        x2 = round(val)
-        dictionary[key] = lmbda * x1 + (1 - lmbda) * x2
-    
-    return dictionary
+def _iterate(step, state, tolerance, max_iter, name, callback=None):
+    # Advances the (n, n_configs) matrices in state with step(state, active) until every
+    # column has converged on its own 'trust' column, converged columns are masked out.
+    # A callback gets the metrics of every iteration, step is then also given a phase clock.
+    # max_iter counts step evaluations, an accelerated step may evaluate several per iteration
+    active = np.arange(len(tolerance))
+    clock = None
+    used = 0
+
+    for i in range(max_iter):
+        if callback is not None:
+            clock = _PhaseClock()
+
+        if len(active) == len(tolerance):
+            old = state
+            state = new = step(old, active, clock)
+        else:
+            old = {key: val[:, active] for key, val in state.items()}
+            new = step(old, active, clock)
+            for key, val in new.items():
+                state[key][:, active] = val
+
+        # An accelerated step is judged against the input of its last evaluation
+        evaluations = getattr(step, 'evaluations', 1)
+        previous = getattr(step, 'previous', old)
+        used += evaluations
+        converged = _converged(new, previous, tolerance[active])
+
+        if callback is not None:
+            clock('convergence')
+            callback({'iteration': i, 'evaluations': evaluations, 'active': active,
+                      'error': np.array([_error(new['trust'][:, n], previous['trust'][:, n]) for n in range(len(active))]),
+                      'converged': converged, 'phases': clock.phases,
+                      'norms': {key: np.linalg.norm(val, axis=0) for key, val in new.items()}})
+
+        if used >= max_iter:
+            for _ in range(np.count_nonzero(~converged)):
+                print(f"{name} reached maximum iteration [{max_iter}]")
+            break
+
+        active = active[~converged]
+        if len(active) == 0:
+            break
+
+    return state
+
+def _converged(new, old, tolerance):
+    return np.array([tolerance[n] > _error(new['trust'][:, n], old['trust'][:, n]) for n in range(len(tolerance))], dtype=bool)
+
+def _squarem(step, tolerance, bounds=None):
+    # SQUAREM extrapolation (Varadhan & Roland, 2008) around step: two plain steps give the
+    # residual r and its change v, the state inputs (every key but 'confidence') are pushed to
+    # x0 - 2a r + a^2 v and stabilised by a third step. Columns whose extrapolation is not
+    # finite, leaves bounds or does not shrink the residual keep the second plain step. The
+    # cycle stops early once all columns converge on a plain step, as they would without it
+    def _step(state, active, clock):
+        _step.evaluations, _step.previous = 1, state
+        first = step(state, active, clock)
+        if _converged(first, state, tolerance[active]).all():
+            return first
+
+        _step.evaluations, _step.previous = 2, first
+        second = step(first, active, clock)
+        if _converged(second, first, tolerance[active]).all():
+            return second
+
+        keys = [key for key in state if key != 'confidence']
+        r = {key: first[key] - state[key] for key in keys}
+        v = {key: second[key] - first[key] - r[key] for key in keys}
+        r_norm = np.sqrt(sum(np.square(r[key]).sum(axis=0) for key in keys))
+        v_norm = np.sqrt(sum(np.square(v[key]).sum(axis=0) for key in keys))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            alpha = np.minimum(np.nan_to_num(-r_norm / v_norm, nan=-1), -1)
+
+        x = {key: state[key] - 2 * alpha * r[key] + alpha ** 2 * v[key] for key in keys}
+        ok = np.all([np.isfinite(x[key]).all(axis=0) for key in keys], axis=0)
+        if bounds is not None:
+            ok &= (x['trust'] >= bounds[0]).all(axis=0) & (x['trust'] <= bounds[1]).all(axis=0)
+
+        _step.evaluations, _step.previous = 3, dict(state, **x)
+        extrapolated = step(_step.previous, active, clock)
+        residual = np.sqrt(sum(np.square(extrapolated[key] - x[key]).sum(axis=0) for key in keys))
+        ok &= residual <= r_norm
+
+        for key, val in extrapolated.items():
+            val[:, ~ok] = second[key][:, ~ok]
+            if key in _step.previous:
+                _step.previous[key] = np.where(ok, _step.previous[key], first[key])
+        return extrapolated
+
+    return _step
 
 def _normalise(val, val_min, val_max):
-    if val_min == val_max: return val
-    return val - val_min / (val_max - val_min)
-
-def _get_top(claims, confidence):
-    return pd.DataFrame({0: _get_highest_confidence(claims, confidence)}).transpose()
-
-def _get_top_k(claims, confidence, k, prefix):
-    if k == 1:
-        df = _get_top(claims, confidence)
-    else:
-        cols = []
-        for i, d in enumerate(claims['DataItem'].unique()):
-            values = claims[claims['DataItem'] == d]['Value'].unique()
-            confidences = _map_dict(values, confidence)
-            top_k = np.argpartition(confidences, -k)[-k:]
-            cols.append(pd.DataFrame({i: values[top_k[np.argsort(confidences[top_k])][::-1]]}))
-
-        df = pd.concat(cols, axis=1)
-    df.index = [f"{prefix}_{x+1}" for x in range(k)]
-    return df
\ No newline at end of file
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(val_min == val_max, val, val - val_min / (val_max - val_min))
+
+def _get_top_k(cc, confidence, k, prefix):
+    # Facts sorted by data item, then descending confidence, ties keep order of appearance
+    order = np.lexsort((np.arange(cc.n_facts), -confidence, cc.fact_item))
+    items = cc.fact_item[order]
+    starts = np.searchsorted(items, np.arange(cc.n_items))
+    rank = np.arange(cc.n_facts) - starts[items]
+    top = rank < k
+
+    # Data items with fewer than k values are padded with 0
+    res = np.zeros((k, cc.n_items), dtype=cc.fact_value.dtype)
+    res[rank[top], items[top]] = cc.fact_value[order[top]]
+
+    if k > 1:
+        # Items with ties among their top k keep the np.argpartition order of the per-item loop
+        ranked = confidence[order]
+        tied = (rank > 0) & (rank <= k) & (ranked == np.roll(ranked, 1))
+        by_item = np.argsort(cc.fact_item, kind='stable')
+        ends = np.append(starts[1:], cc.n_facts)
+        for d in np.unique(items[tied]):
+            facts = by_item[starts[d]:ends[d]]
+            if len(facts) < k: continue
+            conf = confidence[facts]
+            top_k = np.argpartition(conf, -k)[-k:]
+            res[:, d] = cc.fact_value[facts[top_k[np.argsort(conf[top_k])][::-1]]]
+
+    return pd.DataFrame(res, index=[f"{prefix}_{x+1}" for x in range(k)])
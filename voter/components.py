@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from concurrent.futures import ProcessPoolExecutor
+
+from ._claims import compile_claims
+from .session import COLUMNS
+
+def label_components(claims):
+    """Connected components of the bipartite source-data item graph of the claims.
+
+    Returns the number of components and the component of every data item, in order of first
+    appearance (the columns of a voter's results).
+    """
+    from scipy import sparse
+    from scipy.sparse import csgraph
+
+    cc = compile_claims(claims)
+    graph = sparse.bmat([[None, cc.item_source], [cc.item_source.T, None]])
+    n_components, labels = csgraph.connected_components(graph, directed=False)
+
+    # Renumbered in order of first appearance of their data items, every component has some
+    _, first = np.unique(labels[:cc.n_items], return_index=True)
+    renumber = np.empty(n_components, dtype=np.intp)
+    renumber[np.argsort(first)] = np.arange(n_components)
+    return n_components, renumber[labels[:cc.n_items]]
+
+def run_components(voter, claims, workers=1, **kwargs):
+    """Runs the voter on every connected component of the claims on its own and stitches the results.
+
+    No trust or confidence flows between components, so each one iterates until its own
+    convergence test passes, in ``workers`` processes when more than one. The top-k values are
+    put back in the data item order of ``voter.run(claims)``. For TruthFinder only the number of
+    iterations can differ from a global run. TwoEstimates and ThreeEstimates normalise (``_dict_norm``)
+    and total confidence per component instead of over all facts and sources, which changes their
+    results. Other keyword arguments are passed on to ``voter.run``.
+    """
+    cc = compile_claims(claims)
+    n_components, labels = label_components(cc)
+    if n_components == 0:
+        # No claims, the empty frame of the voter itself
+        return voter.run(claims, **kwargs)
+
+    # Claims of each component in their original order, the largest components first
+    frame = cc.frame
+    columns = {col: np.asarray(frame[col]) for col in COLUMNS}
+    claim_label = labels[cc.claim_item]
+    order = np.argsort(claim_label, kind='stable')
+    bounds = np.searchsorted(claim_label[order], np.arange(n_components + 1))
+    parts = [{col: val[order[bounds[c]:bounds[c + 1]]] for col, val in columns.items()} for c in range(n_components)]
+    schedule = np.argsort(-np.diff(bounds), kind='stable')
+
+    if workers > 1 and n_components > 1:
+        with ProcessPoolExecutor(min(workers, n_components)) as pool:
+            futures = {c: pool.submit(_run_component, voter, parts[c], kwargs) for c in schedule}
+            results = {c: future.result() for c, future in futures.items()}
+    else:
+        results = {c: _run_component(voter, parts[c], kwargs) for c in schedule}
+
+    # Within a component data items keep their relative order, so its columns map back in sequence
+    first = results[0]
+    res = np.zeros((len(first.index), cc.n_items), dtype=cc.fact_value.dtype)
+    for c, values in results.items():
+        res[:, labels == c] = values.to_numpy()
+    return pd.DataFrame(res, index=first.index)
+
+def _run_component(voter, claims, kwargs):
+    return voter.run(claims, **kwargs)
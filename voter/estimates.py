@@ -1,154 +1,164 @@
 import numpy as np
 import pandas as pd
 
-from ._common import _map_dict, _error, _dict_norm, _get_top_k
+from ._common import _bincount, _dict_norm, _map_dict, _run_batch, _run_single
 
 class TwoEstimates():
     
-    def __init__(self, base_trust, tolerance=0.001, lmbda=0.5) -> None:
+    def __init__(self, base_trust, tolerance=0.001, lmbda=0.5, accelerate=False) -> None:
         self.base_trust = base_trust
         self.tolerance = tolerance
         self.lmbda = lmbda
+        self.accelerate = accelerate
 
     def _get_info(self):
-        return {'name': 'TwoEstimates', 
+        info = {'name': 'TwoEstimates', 
                 'base_trust': self.base_trust, 
                 'tolerance': self.tolerance,
                 'lmbda': self.lmbda}
+        if self.accelerate:
+            info['accelerate'] = True
+        return info
         
-    def run(self, claims, max_iter=100, top=1):
-        trustworthiness = {s: self.base_trust for s in claims['Source'].unique()}
-        confidence = {}
-        
-        for i in range(max_iter):
-            tw_old = list(trustworthiness.values())
-                        
-            for d in claims['DataItem'].unique():     
-                vs_pairs = claims[(claims['DataItem'] == d)][['Value', 'Source']]
-                for v in vs_pairs['Value'].unique():
-                    
-                    # Update Confidence
-                    sources = vs_pairs.loc[(claims['Value'] == v)]['Source']
-                    pos = (1 - _map_dict(sources, trustworthiness)).sum()
-                    
-                    sources = vs_pairs.loc[(claims['Value'] != v)]['Source']
-                    neg = _map_dict(sources, trustworthiness).sum()
-                    
-                    temp = len(claims[claims['DataItem'] == d]['Source'])
-                    confidence[v] = (pos + neg) / temp
-            
-            # Normalise Confidence
-            confidence = _dict_norm(confidence, self.lmbda)
-
-            for s in claims['Source'].unique():
-                
-                # Update Trustworthiness
-                values = claims[claims['Source'] == s]['Value'].unique()
-                pos = (1 - _map_dict(values, confidence)).sum()
-                
-                values = claims[claims['Source'] != s]['Value'].unique()
-                neg = _map_dict(values, confidence).sum()
-                
-                temp = len(claims[claims['Source'] == s]['Value'].unique())
-                trustworthiness[s] = (pos + neg) / temp
-
-            # Normalise Trustworthiness
-            trustworthiness = _dict_norm(trustworthiness, self.lmbda)
-
-            # Check Convergence
-            if self.tolerance > _error(list(trustworthiness.values()), tw_old):
-                break
-            
-            if i >= max_iter - 1:
-                print(f"TwoEstimates reached maximum iteration [{max_iter}]")
-
-        return _get_top_k(claims, confidence, top, "TwoEstimates")
+    def run(self, claims, max_iter=100, top=1, initial_state=None, return_state=False, callback=None):
+        return _run_single(self, claims, max_iter, top, initial_state, return_state, callback)
+
+    @classmethod
+    def run_batch(cls, claims, configs, max_iter=100, top=1, initial_state=None, return_state=False, callback=None):
+        """Runs several configurations (voters or constructor kwargs) together on the same claims, see ``_run_batch``."""
+        return _run_batch(cls, claims, configs, max_iter, top, initial_state, return_state, callback, "TwoEstimates")
+
+    @staticmethod
+    def _initial_state(cc, voters):
+        return {
+            'trust': np.tile(np.array([v.base_trust for v in voters], dtype=np.float64), (cc.n_sources, 1)),
+            'confidence': np.zeros((cc.n_facts, len(voters)))
+        }
+
+    @staticmethod
+    def _make_step(cc, voters):
+        lmbda = np.array([v.lmbda for v in voters])
+        return lambda state, active, clock: _two_estimates_step(cc, state['trust'], lmbda[active], clock)
 
 
 class ThreeEstimates():
     
-    def __init__(self, base_trust, tolerance=0.001, lmbda=0.5, base_error_factor=0.1) -> None:
+    def __init__(self, base_trust, tolerance=0.001, lmbda=0.5, base_error_factor=0.1, accelerate=False) -> None:
         self.base_trust = base_trust
         self.tolerance = tolerance  
         self.lmbda = lmbda
         self.base_error_factor = base_error_factor
+        self.accelerate = accelerate
 
     def _get_info(self):
-        return {'name': 'ThreeEstimates', 
+        info = {'name': 'ThreeEstimates', 
                 'base_trust': self.base_trust, 
                 'tolerance': self.tolerance,
                 'lmbda': self.lmbda,
                 'base_error_factor': self.base_error_factor}
-
-    def run(self, claims, max_iter=100, top=1):
-        trustworthiness = {s: self.base_trust for s in claims['Source'].unique()}
-        error_factor = {v: self.base_error_factor for v in claims['Value'].unique()}
-        
-        confidence = {}
-        
-        for i in range(max_iter):
-            tw_old = list(trustworthiness.values())
-
-            # Update Confidence 
-            for d in claims['DataItem'].unique():     
-                vs_pairs = claims[(claims['DataItem'] == d)][['Value', 'Source']]
-                for v in vs_pairs['Value'].unique():
-                    
-                    sources = vs_pairs.loc[(claims['Value'] == v)]['Source']
-                    pos = (1 - _map_dict(sources, trustworthiness) * error_factor[v]).sum()
-                    
-                    sources = vs_pairs.loc[(claims['Value'] != v)]['Source']
-                    neg = (_map_dict(sources, trustworthiness) * error_factor[v]).sum()
-                    
-                    temp = len(claims[claims['DataItem'] == d]['Source'])
-                    confidence[v] = (pos + neg) / temp
-            
-            # Normalise Confidence
-            confidence = _dict_norm(confidence, self.lmbda)
-
-            # Update Error Factor
-            for d in claims['DataItem'].unique():     
-                vs_pairs = claims[(claims['DataItem'] == d)][['Value', 'Source']]
-                
-                norm = np.count_nonzero(_map_dict(vs_pairs['Source'], trustworthiness))
-                
-                for v in vs_pairs['Value'].unique():
-                    
-                    sources = vs_pairs.loc[(claims['Value'] == v)]['Source']
-                    ts = _map_dict(sources, trustworthiness)
-                    pos = ((1 - confidence[v]) / ts[ts != 0]).sum()
-                    
-                    sources = vs_pairs.loc[(claims['Value'] != v)]['Source']
-                    ts = _map_dict(sources, trustworthiness)
-                    neg = (confidence[v] / ts[ts != 0]).sum()
-                    
-                    error_factor[v] = (pos + neg) / norm
-            
-            # Normalise Error Factor
-            error_factor = _dict_norm(error_factor, self.lmbda)
-
-            # Update Confidence
-            for s in claims['Source'].unique():
-
-                values = claims[claims['Source'] == s]['Value'].unique()
-                ev = _map_dict(values, error_factor)
-                pos = ((1 - _map_dict(values, confidence)[ev != 0]) / ev[ev != 0]).sum()
-                
-                values = claims[claims['Source'] != s]['Value'].unique()
-                ev = _map_dict(values, error_factor)
-                neg = (_map_dict(values, confidence)[ev != 0] / ev[ev != 0]).sum() * len(claims[claims['Source'] == s]['DataItem'].unique())
-                
-                temp = claims[claims['Source'] == s]['Value'].unique()
-                trustworthiness[s] = (pos + neg) / np.count_nonzero(_map_dict(temp, error_factor))
-
-            # Normalise Trustworthiness
-            trustworthiness = _dict_norm(trustworthiness, self.lmbda)
-
-            # Check Convergence
-            if self.tolerance > _error(list(trustworthiness.values()), tw_old):
-                break
-
-            if i >= max_iter - 1:
-                print(f"ThreeEstimates reached maximum iteration [{max_iter}]")
-
-        return _get_top_k(claims, confidence, top, "ThreeEstimates")
+        if self.accelerate:
+            info['accelerate'] = True
+        return info
+
+    def run(self, claims, max_iter=100, top=1, initial_state=None, return_state=False, callback=None):
+        return _run_single(self, claims, max_iter, top, initial_state, return_state, callback)
+
+    @classmethod
+    def run_batch(cls, claims, configs, max_iter=100, top=1, initial_state=None, return_state=False, callback=None):
+        """Runs several configurations (voters or constructor kwargs) together on the same claims, see ``_run_batch``."""
+        return _run_batch(cls, claims, configs, max_iter, top, initial_state, return_state, callback, "ThreeEstimates")
+
+    @staticmethod
+    def _initial_state(cc, voters):
+        return {
+            'trust': np.tile(np.array([v.base_trust for v in voters], dtype=np.float64), (cc.n_sources, 1)),
+            'error_factor': np.tile(np.array([v.base_error_factor for v in voters], dtype=np.float64), (cc.n_facts, 1)),
+            'confidence': np.zeros((cc.n_facts, len(voters)))
+        }
+
+    @staticmethod
+    def _make_step(cc, voters):
+        lmbda = np.array([v.lmbda for v in voters])
+        # Reciprocal trust and error factor buffers, reused across iterations (the first columns while some are active)
+        inv_trust = np.zeros((cc.n_sources, len(voters)))
+        inv_error = np.zeros((cc.n_facts, len(voters)))
+        return lambda state, active, clock: _three_estimates_step(cc, state['trust'], state['error_factor'], lmbda[active], clock,
+                                                                  inv_trust[:, :len(active)], inv_error[:, :len(active)])
+
+
+def _two_estimates_step(cc, trustworthiness, lmbda, clock=None):
+    fact_item = cc.fact_item
+
+    # Update Confidence, neg is the item total minus the fact's own contribution
+    own = cc.fact_source @ trustworthiness
+    pos = cc.fact_source @ (1 - trustworthiness)
+    neg = (cc.item_source @ trustworthiness)[fact_item] - own
+    confidence = (pos + neg) / cc.item_claims[fact_item, None]
+    if clock is not None: clock('confidence')
+    
+    # Normalise Confidence
+    confidence = _dict_norm(confidence, lmbda)
+    if clock is not None: clock('normalisation')
+
+    # Update Trustworthiness, neg is the global total minus facts only claimed by the source
+    pos = cc.source_fact_bin @ (1 - confidence)
+    neg = confidence.sum(axis=0) - cc.source_exclusive @ confidence
+    trustworthiness = (pos + neg) / cc.source_facts[:, None]
+    if clock is not None: clock('trust')
+
+    # Normalise Trustworthiness
+    trustworthiness = _dict_norm(trustworthiness, lmbda)
+    if clock is not None: clock('normalisation')
+    return {'trust': trustworthiness, 'confidence': confidence}
+
+def _three_estimates_step(cc, trustworthiness, error_factor, lmbda, clock=None, inv_trust=None, inv_error=None):
+    fact_item = cc.fact_item
+    item_claims = cc.item_claims[fact_item, None]
+
+    # Update Confidence 
+    own = cc.fact_source @ trustworthiness
+    claim_trust = _map_dict(cc.claim_source, trustworthiness) * _map_dict(cc.claim_fact, error_factor)
+    pos = _bincount(cc.claim_fact, 1 - claim_trust, cc.n_facts)
+    neg = ((cc.item_source @ trustworthiness)[fact_item] - own) * error_factor
+    confidence = (pos + neg) / item_claims
+    if clock is not None: clock('confidence')
+    
+    # Normalise Confidence
+    confidence = _dict_norm(confidence, lmbda)
+    if clock is not None: clock('normalisation')
+
+    # Update Error Factor
+    trust_mask = trustworthiness != 0
+    inv_trust = np.zeros_like(trustworthiness) if inv_trust is None else inv_trust
+    inv_trust.fill(0)
+    np.divide(1, trustworthiness, out=inv_trust, where=trust_mask)
+    norm = (cc.item_source @ trust_mask.astype(np.float64))[fact_item]
+
+    own = cc.fact_source @ inv_trust
+    pos = (1 - confidence) * own
+    neg = confidence * ((cc.item_source @ inv_trust)[fact_item] - own)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        error_factor = (pos + neg) / norm
+    if clock is not None: clock('error_factor')
+    
+    # Normalise Error Factor
+    error_factor = _dict_norm(error_factor, lmbda)
+    if clock is not None: clock('normalisation')
+
+    # Update Trustworthiness
+    error_mask = error_factor != 0
+    inv_error = np.zeros_like(error_factor) if inv_error is None else inv_error
+    inv_error.fill(0)
+    np.divide(1, error_factor, out=inv_error, where=error_mask)
+
+    pos = cc.source_fact_bin @ ((1 - confidence) * inv_error)
+    weighted = confidence * inv_error
+    neg = (weighted.sum(axis=0) - cc.source_exclusive @ weighted) * cc.source_items[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        trustworthiness = (pos + neg) / (cc.source_fact_bin @ error_mask.astype(np.float64))
+    if clock is not None: clock('trust')
+
+    # Normalise Trustworthiness
+    trustworthiness = _dict_norm(trustworthiness, lmbda)
+    if clock is not None: clock('normalisation')
+    return {'trust': trustworthiness, 'error_factor': error_factor, 'confidence': confidence}
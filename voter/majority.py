@@ -1,12 +1,39 @@
+import numpy as np
 import pandas as pd
 
 class Majority():
+    """Most frequent value per data item, ties go to the smallest value (as ``Series.mode()[0]``).
+
+    With ``weights`` every claim counts with the weight of its source, given as an array indexed
+    by source id or as a mapping (dict, Series) from source label to weight.
+    """
+
+    def __init__(self, weights=None) -> None:
+        self.weights = weights
 
     def _get_info(self):
-        return {'name': 'Majority'}
+        if self.weights is None:
+            return {'name': 'Majority'}
+        return {'name': 'Majority', 'weighted': True}
 
     def run(self, claims):
-        res = []
-        for d in claims['DataItem'].unique():
-            res.append(claims[claims['DataItem'] == d]['Value'].mode()[0])
-        return pd.DataFrame({"Majority": res}).transpose()
\ No newline at end of file
+        item, _ = pd.factorize(claims['DataItem'])
+        value, uniques = pd.factorize(claims['Value'], sort=True)
+
+        # Counts per (item, value) pair, pairs sorted by item and then by value
+        pairs, pair_codes = np.unique(item.astype(np.int64) * len(uniques) + value, return_inverse=True)
+        counts = np.bincount(pair_codes.ravel(), self._claim_weights(claims), len(pairs))
+        pair_item, pair_value = pairs // len(uniques), pairs % len(uniques)
+
+        # Highest count first within each item, the stable sort keeps the smallest value first on ties
+        order = np.lexsort((-counts, pair_item))
+        first = order[np.flatnonzero(np.diff(pair_item[order], prepend=-1))]
+
+        return pd.DataFrame({"Majority": uniques[pair_value[first]]}).transpose()
+
+    def _claim_weights(self, claims):
+        if self.weights is None:
+            return None
+        if isinstance(self.weights, (dict, pd.Series)):
+            return pd.Series(self.weights).loc[claims['Source']].to_numpy(dtype=np.float64)
+        return np.asarray(self.weights, dtype=np.float64)[np.asarray(claims['Source'])]
\ No newline at end of file
@@ -0,0 +1,45 @@
+import timeit
+
+import numpy as np
+
+class IterationLog():
+    """Callback for the iterative voters that keeps the per-iteration metrics of a run.
+
+    Every iteration the voter calls it with a dict holding the 'iteration' number, the step
+    'evaluations' it took (up to three when accelerated), the 'active' configurations (columns
+    of a batch run), their convergence 'error' and 'converged' flags, the 'phases' wall times
+    in seconds and the 'norms' of the updated state vectors.
+    """
+
+    def __init__(self) -> None:
+        self.iterations = []
+
+    def __call__(self, metrics):
+        self.iterations.append(metrics)
+
+    def summary(self, column=0):
+        """Number of iterations and step evaluations, converged flag and total time per phase of one configuration."""
+        iterations, evaluations, converged, phases = 0, 0, False, {}
+        for metrics in self.iterations:
+            idx = np.flatnonzero(metrics['active'] == column)
+            if len(idx) == 0:
+                continue
+            iterations += 1
+            evaluations += metrics['evaluations']
+            converged = bool(metrics['converged'][idx[0]])
+            for phase, seconds in metrics['phases'].items():
+                phases[phase] = phases.get(phase, 0) + seconds
+        return {'iterations': iterations, 'evaluations': evaluations, 'converged': converged, 'phase_times': phases}
+
+
+class _PhaseClock():
+    # Attributes the time since the previous mark to the named phase, repeated phases add up
+
+    def __init__(self) -> None:
+        self.phases = {}
+        self.last = timeit.default_timer()
+
+    def __call__(self, phase):
+        now = timeit.default_timer()
+        self.phases[phase] = self.phases.get(phase, 0) + now - self.last
+        self.last = now
@@ -1,10 +1,15 @@
+import numpy as np
 import pandas as pd
 
 class Optimal():
     
     def run(self, claims, truth):
-        res = []
-        for d in claims['DataItem'].unique():
-            t = truth[d][0]
-            res.append(t if t in claims[claims['DataItem'] == d]['Value'].to_numpy() else 0)
-        return pd.DataFrame({"Optimal": res}).transpose()
\ No newline at end of file
+        truth = np.ravel(truth)
+        item, items = pd.factorize(claims['DataItem'])
+
+        # The true value of an item is reachable if any claim on the item makes it
+        found = np.zeros(len(items), dtype=bool)
+        found[item[np.asarray(claims['Value']) == truth[np.asarray(claims['DataItem'])]]] = True
+
+        t = truth[np.asarray(items)]
+        return pd.DataFrame({"Optimal": np.where(found, t, 0)}).transpose()
\ No newline at end of file
@@ -0,0 +1,292 @@
+import numpy as np
+import pandas as pd
+
+from types import SimpleNamespace
+
+from ._claims import CompiledClaims, compile_claims
+from ._common import _iterate, _get_top_k
+from .truth_finder import TruthFinder
+
+COLUMNS = ['Source', 'DataItem', 'Value']
+
+class Session():
+    """Online truth discovery over claims that are added or retracted over time.
+
+    Sources, data items and facts keep their code for the whole session and the claim counts are
+    updated in place, so an update costs time in the size of the delta rather than of all claims.
+    Every update warm-starts from the previous trust, confidence and error factors. For
+    TruthFinder only the sources and facts reached from the changed claims are recomputed, until
+    none of the touched sources moves by more than the tolerance. TwoEstimates and ThreeEstimates
+    normalise over all facts and sources, so they warm-start but iterate globally.
+    """
+
+    def __init__(self, voter, max_iter=100) -> None:
+        self.voter = voter
+        self.max_iter = max_iter
+        self.counts = None
+        self.state = None
+
+    @property
+    def claims(self):
+        """The current claims, one row per claim, grouped by fact."""
+        if self.counts is None:
+            return pd.DataFrame({col: pd.Series(dtype=np.int64) for col in COLUMNS})
+        return self.counts.claims()
+
+    def add(self, claims):
+        if self.counts is None:
+            cc = compile_claims(claims[COLUMNS].reset_index(drop=True))
+            voters = [self.voter]
+            self.state = _iterate(self.voter._make_step(cc, voters), self.voter._initial_state(cc, voters),
+                                  np.array([self.voter.tolerance]), self.max_iter, self.voter.__class__.__name__)
+            self.counts = _ClaimCounts(cc)
+            return
+
+        facts, sources = self.counts.encode(claims, create=True)
+        self._grow()
+        self.counts.update(facts, sources, np.ones(len(facts)))
+        self._update(facts, sources)
+
+    def retract(self, claims):
+        if self.counts is None:
+            return
+
+        # Every copy of a retracted claim is removed, unknown claims are ignored
+        facts, sources = self.counts.encode(claims, create=False)
+        if len(facts) == 0:
+            return
+        pairs = np.unique(facts.astype(np.int64) * self.counts.n_sources + sources)
+        facts, sources = pairs // self.counts.n_sources, pairs % self.counts.n_sources
+        current = np.asarray(self.counts.fact_rows(facts)[np.arange(len(facts)), sources]).ravel()
+        keep = current > 0
+        self.counts.update(facts[keep], sources[keep], -current[keep])
+        self._update(facts[keep], sources[keep])
+
+    def result(self, top=1):
+        name = self.voter.__class__.__name__
+        if self.counts is None:
+            # Nothing added yet, the empty result a voter gives on no claims
+            facts = SimpleNamespace(n_facts=0, fact_item=np.zeros(0, dtype=np.intp), n_items=0,
+                                    fact_value=np.zeros(0, dtype=np.int64))
+            return _get_top_k(facts, np.zeros(0), top, name)
+
+        live_facts, fact_item, n_items = self.counts.live_facts()
+        facts = SimpleNamespace(n_facts=len(live_facts), fact_item=fact_item, n_items=n_items,
+                                fact_value=self.counts.fact_value[live_facts])
+        return _get_top_k(facts, self.state['confidence'][live_facts, 0], top, name)
+
+    def _grow(self):
+        # New sources and facts start from the voter's base values
+        sizes = SimpleNamespace(n_sources=self.counts.n_sources - len(self.state['trust']),
+                                n_facts=self.counts.n_facts - len(self.state['confidence']))
+        if sizes.n_sources or sizes.n_facts:
+            initial = self.voter._initial_state(sizes, [self.voter])
+            self.state = {key: np.concatenate([val, initial[key]]) for key, val in self.state.items()}
+
+    def _update(self, facts, sources):
+        if len(facts) == 0:
+            return
+
+        if isinstance(self.voter, TruthFinder):
+            _propagate(self.voter, self.counts, self.state, np.unique(sources), np.unique(facts), self.max_iter)
+            return
+
+        # Global iteration over the live sources and facts, written back under their session codes
+        cc, live_sources, live_facts = self.counts.compiled()
+        rows = {'trust': live_sources, 'confidence': live_facts, 'error_factor': live_facts}
+        state = {key: val[rows[key]] for key, val in self.state.items()}
+        state = _iterate(self.voter._make_step(cc, [self.voter]), state, np.array([self.voter.tolerance]),
+                         self.max_iter, self.voter.__class__.__name__)
+        for key, val in state.items():
+            self.state[key][rows[key]] = val
+
+
+class _ClaimCounts():
+    # Claim counts per (fact, source) under codes that stay fixed for the session, new labels are
+    # appended. The counts are a compacted CSR base and the (fact, source, count) changes since,
+    # which are merged into the base once they grow past a fraction of it.
+
+    COMPACT = 0.1
+
+    def __init__(self, cc) -> None:
+        self.sources = dict(zip(cc.sources.tolist(), range(cc.n_sources)))
+        self.source_labels = cc.sources.tolist()
+        self.items = dict(zip(cc.items.tolist(), range(cc.n_items)))
+        self.item_labels = cc.items.tolist()
+        self.facts = dict(zip(zip(cc.fact_item.tolist(), cc.fact_value.tolist()), range(cc.n_facts)))
+        self.fact_item = cc.fact_item
+        self.fact_value = cc.fact_value
+
+        self.base = cc.fact_source
+        self.base_t = cc.source_fact
+        self._reset()
+
+    @property
+    def n_sources(self):
+        return len(self.source_labels)
+
+    @property
+    def n_facts(self):
+        return len(self.fact_item)
+
+    def encode(self, claims, create):
+        # Fact and source codes of the claims, unknown labels get new codes or (create=False) are dropped
+        facts, sources = [], []
+        new_items, new_values = [], []
+        for source, item, value in zip(*(claims[col].tolist() for col in COLUMNS)):
+            if create:
+                s = _code(self.sources, self.source_labels, source)
+                i = _code(self.items, self.item_labels, item)
+                f = self.facts.setdefault((i, value), len(self.fact_item) + len(new_items))
+                if f >= len(self.fact_item) + len(new_items):
+                    new_items.append(i)
+                    new_values.append(value)
+            else:
+                s, i = self.sources.get(source), self.items.get(item)
+                f = None if i is None else self.facts.get((i, value))
+                if s is None or f is None:
+                    continue
+            facts.append(f)
+            sources.append(s)
+
+        if new_items:
+            self.fact_item = np.concatenate([self.fact_item, np.array(new_items, dtype=self.fact_item.dtype)])
+            self.fact_value = np.concatenate([self.fact_value, np.array(new_values)])
+        return np.array(facts, dtype=np.intp), np.array(sources, dtype=np.intp)
+
+    def update(self, facts, sources, counts):
+        self.d_fact = np.concatenate([self.d_fact, facts])
+        self.d_source = np.concatenate([self.d_source, sources])
+        self.d_count = np.concatenate([self.d_count, counts])
+
+        self._delta()
+        if len(self.d_count) > self.COMPACT * self.base.nnz:
+            self.compact()
+
+    def fact_rows(self, facts):
+        """Current counts of the facts, a (len(facts), n_sources) CSR matrix."""
+        return _rows(self.base, self.delta, facts, self.n_sources)
+
+    def source_rows(self, sources):
+        """Current counts of the sources, a (len(sources), n_facts) CSR matrix."""
+        return _rows(self.base_t, self.delta_t, sources, self.n_facts)
+
+    def merged(self):
+        return _resize(self.base, (self.n_facts, self.n_sources)) + self.delta
+
+    def compact(self):
+        self.base = self.merged()
+        self.base.eliminate_zeros()
+        self.base_t = self.base.T.tocsr()
+        self._reset()
+
+    def live_facts(self):
+        # Facts with claims, their data items renumbered over the items that still have any
+        merged = self.merged()
+        merged.eliminate_zeros()
+        live = np.flatnonzero(np.diff(merged.indptr) > 0)
+        items, fact_item = np.unique(self.fact_item[live], return_inverse=True)
+        return live, fact_item, len(items)
+
+    def compiled(self):
+        """CompiledClaims of the live claims and the session codes of its sources and facts."""
+        self.compact()
+        coo = self.base.tocoo()
+        counts = coo.data.astype(np.intp)
+        claim_fact, claim_source = np.repeat(coo.row, counts), np.repeat(coo.col, counts)
+
+        live_sources, claim_source = np.unique(claim_source, return_inverse=True)
+        live_facts, claim_fact = np.unique(claim_fact, return_inverse=True)
+        items, fact_item = np.unique(self.fact_item[live_facts], return_inverse=True)
+
+        cc = CompiledClaims._from_codes(claim_source, fact_item[claim_fact], claim_fact,
+                                        pd.Index(np.array(self.source_labels, dtype=object)[live_sources]),
+                                        pd.Index(np.array(self.item_labels, dtype=object)[items]),
+                                        fact_item, self.fact_value[live_facts])
+        return cc, live_sources, live_facts
+
+    def claims(self):
+        coo = self.merged().tocoo()
+        counts = coo.data.astype(np.intp)
+        facts, sources = np.repeat(coo.row, counts), np.repeat(coo.col, counts)
+        return pd.DataFrame({'Source': np.array(self.source_labels)[sources],
+                             'DataItem': np.array(self.item_labels)[self.fact_item[facts]],
+                             'Value': self.fact_value[facts]})
+
+    def _reset(self):
+        self.d_fact = np.zeros(0, dtype=np.intp)
+        self.d_source = np.zeros(0, dtype=np.intp)
+        self.d_count = np.zeros(0)
+        self._delta()
+
+    def _delta(self):
+        from scipy import sparse
+
+        # Changes of the same pair are summed
+        self.delta = sparse.csr_matrix((self.d_count, (self.d_fact, self.d_source)), shape=(self.n_facts, self.n_sources))
+        self.delta_t = self.delta.T.tocsr()
+
+
+def _code(table, labels, label):
+    code = table.setdefault(label, len(labels))
+    if code == len(labels):
+        labels.append(label)
+    return code
+
+def _resize(matrix, shape):
+    # The CSR matrix with rows and columns appended, no data is copied
+    from scipy import sparse
+
+    indptr = np.concatenate([matrix.indptr, np.full(shape[0] - matrix.shape[0], matrix.indptr[-1])])
+    return sparse.csr_matrix((matrix.data, matrix.indices, indptr), shape=shape)
+
+def _rows(base, delta, rows, n_cols):
+    # Rows of base + delta, rows the base was compacted without are empty in it
+    from scipy import sparse
+
+    inside = rows < base.shape[0]
+    selected = base[rows[inside]]
+    lengths = np.zeros(len(rows), dtype=selected.indptr.dtype)
+    lengths[inside] = np.diff(selected.indptr)
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    old = sparse.csr_matrix((selected.data, selected.indices, indptr), shape=(len(rows), n_cols))
+
+    res = (old + delta[rows]).tocsr()
+    res.eliminate_zeros()
+    return res
+
+def _propagate(voter, counts, state, sources, facts, max_iter):
+    # TruthFinder updates restricted to the sources and facts whose inputs changed
+    trust, confidence = state['trust'][:, 0], state['confidence'][:, 0]
+    dampening_factor = voter.dtype.type(voter.dampening_factor)
+
+    for i in range(max_iter):
+        # Update Confidence of the facts claimed by changed sources
+        facts = np.union1d(facts, counts.source_rows(sources).indices)
+        fact_rows = counts.fact_rows(facts)
+        with np.errstate(divide='ignore'):
+            v_conf = fact_rows @ np.log(1 - trust)
+        new_conf = (1 / (1 + np.exp(dampening_factor * v_conf))).astype(voter.dtype)
+        changed = np.abs(new_conf - confidence[facts]) > voter.tolerance
+        confidence[facts] = new_conf
+
+        # Update Trustworthiness of the claimants of changed facts, sources without claims keep theirs
+        sources = np.union1d(sources, fact_rows[np.flatnonzero(changed)].indices)
+        source_rows = counts.source_rows(sources)
+        source_rows.data[:] = 1
+        source_facts = np.diff(source_rows.indptr)
+        new_trust = np.divide(source_rows @ confidence, source_facts, out=trust[sources].astype(np.float64),
+                              where=source_facts > 0).astype(voter.dtype)
+        moved = np.abs(new_trust - trust[sources]) > voter.tolerance
+        trust[sources] = new_trust
+
+        # Check Convergence, on the touched sources only
+        if not moved.any():
+            break
+
+        if i >= max_iter - 1:
+            print(f"TruthFinder reached maximum iteration [{max_iter}]")
+
+        sources, facts = sources[moved], facts[:0]
+
+    return state
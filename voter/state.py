@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+class VoterState():
+    """Trust, confidence and (for ThreeEstimates) error factors of a voter run.
+
+    Values are labelled by source and by (DataItem, Value) fact, so a state can warm-start a
+    run on a different claims table: matching sources and facts start from the stored values,
+    new ones from the voter's base values.
+    """
+
+    KEYS = ['trust', 'confidence', 'error_factor']
+
+    def __init__(self, sources, fact_items, fact_values, trust, confidence, error_factor=None) -> None:
+        self.sources = np.asarray(sources)
+        self.fact_items = np.asarray(fact_items)
+        self.fact_values = np.asarray(fact_values)
+        self.trust = np.asarray(trust)
+        self.confidence = np.asarray(confidence)
+        self.error_factor = None if error_factor is None else np.asarray(error_factor)
+
+    @classmethod
+    def from_compiled(cls, cc, state, column=0):
+        arrays = {key: state[key][:, column].copy() for key in cls.KEYS if key in state}
+        return cls(_labels(cc.sources), _labels(cc.items[cc.fact_item]), _labels(cc.fact_value), **arrays)
+
+    def save(self, path):
+        arrays = {key: getattr(self, key) for key in self.KEYS if getattr(self, key) is not None}
+        np.savez(path, sources=self.sources, fact_items=self.fact_items, fact_values=self.fact_values, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    def _warm_start(self, cc, state):
+        # Overwrites the rows of the (n, n_configs) state matrices that have a stored value
+        source_idx = pd.Index(self.sources).get_indexer(cc.sources)
+        fact_idx = pd.MultiIndex.from_arrays([self.fact_items, self.fact_values]).get_indexer(cc.fact_index())
+
+        for key, val in state.items():
+            stored = getattr(self, key, None)
+            if stored is None:
+                continue
+            idx = source_idx if key == 'trust' else fact_idx
+            val[idx >= 0] = stored[idx[idx >= 0], None]
+        return state
+
+
+def _labels(values):
+    # Plain (non-object) arrays so that saved states load without pickle
+    return np.asarray(pd.Index(values).tolist())
@@ -1,52 +1,86 @@
 import numpy as np
 import pandas as pd
 
-from ._common import _map_dict, _error, _get_highest_confidence, _get_top, _get_top_k
+from ._common import _bincount, _map_dict, _run_batch, _run_single
 
 class TruthFinder():
     
-    def __init__(self, base_trust, tolerance=0.001, dampening_factor=0.1) -> None:
+    def __init__(self, base_trust, tolerance=0.001, dampening_factor=0.1, backend='sparse', dtype=np.float64,
+                 accelerate=False) -> None:
+        assert backend in ('sparse', 'numpy')
         self.base_trust = base_trust
         self.tolerance = tolerance
         self.dampening_factor = dampening_factor
+        self.backend = backend
+        self.dtype = np.dtype(dtype)
+        self.accelerate = accelerate
     
     def _get_info(self):
-        return {'name': 'TruthFinder', 
+        info = {'name': 'TruthFinder', 
                 'base_trust': self.base_trust, 
                 'tolerance': self.tolerance, 
                 'dampening_factor': self.dampening_factor}
+        if self.accelerate:
+            info['accelerate'] = True
+        return info
     
-    def run(self, claims, max_iter=100, top=1):
-        trustworthiness = {s: self.base_trust for s in claims['Source'].unique()}
-        confidence = {}
-        
-        for i in range(max_iter):
-            tw_old = list(trustworthiness.values())
-                        
-            for d in claims['DataItem'].unique():     
-                vs_pairs = claims[(claims['DataItem'] == d)][['Value', 'Source']]
-                for v in vs_pairs['Value'].unique():
-                    
-                    # Update Confidence
-                    sources = vs_pairs.loc[(claims['Value'] == v)]['Source']
-                    v_conf = np.log(1 - _map_dict(sources, trustworthiness)).sum()
-                                        
-                    # Adjust Confidence (SKIPPED)
-                    
-                    # Dampen Confidence
-                    confidence[v] = 1 / (1 + np.exp(self.dampening_factor * v_conf))
-                            
-            for s in claims['Source'].unique():
-                
-                # Update Trustworthiness
-                values = claims[claims['Source'] == s]['Value'].unique()
-                trustworthiness[s] = _map_dict(values, confidence).sum() / len(values)
-
-            # Check Convergence
-            if self.tolerance > _error(list(trustworthiness.values()), tw_old):
-                break
-        
-            if i >= max_iter - 1:
-                print(f"TruthFinder reached maximum iteration [{max_iter}]")
-
-        return _get_top_k(claims, confidence, top, "TruthFinder")
+    def run(self, claims, max_iter=100, top=1, initial_state=None, return_state=False, callback=None):
+        return _run_single(self, claims, max_iter, top, initial_state, return_state, callback)
+
+    @classmethod
+    def run_batch(cls, claims, configs, max_iter=100, top=1, initial_state=None, return_state=False, callback=None):
+        """Runs several configurations (voters or constructor kwargs) together on the same claims, see ``_run_batch``.
+
+        When accelerated, the extrapolated trust is kept within [0, 1].
+        """
+        return _run_batch(cls, claims, configs, max_iter, top, initial_state, return_state, callback, "TruthFinder", bounds=(0, 1))
+
+    @staticmethod
+    def _initial_state(cc, voters):
+        dtype = voters[0].dtype
+        return {
+            'trust': np.tile(np.array([v.base_trust for v in voters], dtype=dtype), (cc.n_sources, 1)),
+            'confidence': np.zeros((cc.n_facts, len(voters)), dtype=dtype)
+        }
+
+    @staticmethod
+    def _make_step(cc, voters):
+        backend, dtype = voters[0].backend, voters[0].dtype
+        dampening_factor = np.array([v.dampening_factor for v in voters], dtype=dtype)
+        step = _step_numpy if backend == 'numpy' else _step_sparse
+        return lambda state, active, clock: step(cc, state['trust'], dampening_factor[active], dtype, clock)
+
+
+def _step_sparse(cc, trustworthiness, dampening_factor, dtype, clock=None):
+    # Update Confidence
+    with np.errstate(divide='ignore'):
+        v_conf = (cc.fact_source @ np.log(1 - trustworthiness)).astype(dtype)
+    
+    # Adjust Confidence (SKIPPED)
+    
+    # Dampen Confidence
+    confidence = 1 / (1 + np.exp(dampening_factor * v_conf))
+    if clock is not None: clock('confidence')
+
+    # Update Trustworthiness
+    trustworthiness = ((cc.source_fact_bin @ confidence) / cc.source_facts[:, None]).astype(dtype)
+    if clock is not None: clock('trust')
+    return {'trust': trustworthiness, 'confidence': confidence}
+
+def _step_numpy(cc, trustworthiness, dampening_factor, dtype, clock=None):
+    # Update Confidence: log(1 - t_s) gathered per claim, summed per fact
+    with np.errstate(divide='ignore'):
+        log_untrust = np.log(1 - trustworthiness)
+    v_conf = _bincount(cc.claim_fact, _map_dict(cc.claim_source, log_untrust), cc.n_facts).astype(dtype)
+
+    # Adjust Confidence (SKIPPED)
+
+    # Dampen Confidence
+    confidence = 1 / (1 + np.exp(dampening_factor * v_conf))
+    if clock is not None: clock('confidence')
+
+    # Update Trustworthiness
+    trust = _bincount(cc.pair_source, _map_dict(cc.pair_fact, confidence), cc.n_sources)
+    trustworthiness = (trust / cc.source_facts[:, None]).astype(dtype)
+    if clock is not None: clock('trust')
+    return {'trust': trustworthiness, 'confidence': confidence}